@@ -41,26 +41,25 @@ def bug_exploit():
 bug_exploit()
 
 from numpy import (
-    float64, exp, concatenate,
-    arange, delete, sqrt,
-    pi, zeros
+    float64, asfortranarray
 )
 
 from pandas import(
-    read_csv, read_excel,
     ExcelWriter, DataFrame
 )
 
 from os.path import(
     sep, expanduser,
-    dirname, splitext
+    dirname, splitext,
+    basename
 )
 
-from scipy.special import erf
-from scipy.optimize import leastsq
-from scipy.integrate import quad
+from threading import Thread, Event
+
+from functools import partial
 
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
@@ -72,94 +71,131 @@ from pyGC.graph.backend_kivyagg import FigureCanvas
 from pyGC.FileBrowser import FileBrowser
 from pyGC import kivy_build
 from pyGC.help_text import texts
+from pyGC.ingest import ImportCancelled
+from pyGC.cache import cached_primer, fit_key, load_fit, store_fit
+from pyGC.trace import uniform_trace, column, data_grid
+from pyGC.engine import fit, refit, get_model
+from pyGC.clusters import fit_clusters
+from pyGC.peaks import find_initials
+from pyGC.sequence import warm_initials
+from pyGC.multistart import fit_multistart
+
+# dtype the raw traces, component curves and exports are stored in - set to
+# float32 to halve their memory on long runs. Fitting always runs in float64.
+STORAGE_DTYPE = float64
+
+# solver functionalize fits with - 'trf' for the bounded trust-region solver,
+# 'sparse' for its sparse-jacobian variant on runs with many peaks. See
+# engine.fit()
+SOLVER = 'leastsq'
+
+# fit each cluster of peaks between baseline gaps on its own, in parallel -
+# much faster on long runs of well separated peaks. See clusters.py
+CLUSTERED = False
+
+# seed each newly imported run with the previous run's fit, shifted by a
+# retention time alignment, instead of waiting for clicks. See sequence.py
+WARM_START = False
 
+# add the peaks clicked after a fit to it, refitting only the new peaks and
+# their overlapping neighbours instead of every peak. See engine.refit()
+INCREMENTAL = False
 
-def calc_primer(dataFile):
+# number of jittered starting points fitted in parallel to look past the local
+# minimum nearest the clicks - 1 fits the clicks alone. See multistart.py
+STARTS = 1
+
+# hand back the stored result when the same data is fitted again with the same
+# model, clicks and settings, instead of solving it again. See cache.py
+CACHE_FITS = True
+
+
+def add_plot(event):
     """
 
-refactors the given user data from the file_popup into an array of GC data.
+adds an 'initials' point for each gaussian guess to  the graph. Activated by
+clicking the graph inside the borders.
 
 ::
 
-    :param dataFile:    (str)
+    :param event:       ('button_press_event')
 
-GC data of Nx2 dimensions. Given as a string equivalent to the directory and
-file name of either a .csv or .xlsx of Nx2 dimensions. Text above and below
-data array will be automatically avoided by the program.
+takes a 'button_press_event' from the app and places a point on the graph at
+the click point, and adds that point to the initials list.
 
 ::
 
-    :return:            (array)
+    :return:            (none)
 
-refactored data set of Nx2 dimensionality in numpy array
+updates the matplotlib canvas visible on the application screen.
     """
 
-    if dataFile is None:
-        error_msg = 'Data must be passed as an array which is mappable ' \
-                   'to an Nx5 numpy array with columns ' \
-                   '[freq, e1, e2, mu1, mu2]'
-        raise RuntimeError(error_msg)
+    #if clicked outside of plot, dont do anyting
+    if isinstance(event.ydata, (int, float, float64)) is False or isinstance(
+            event.xdata, (int, float, float64)) is False or (
+    event.ydata, event.xdata) != (
+            event.ydata, event.xdata): return
 
-    # allows for file location to be passed as the data variable.
-    elif isinstance(dataFile, str) is True:
+    # add clicked point to the list of initial parameters
+    ax.plot(event.xdata, event.ydata, 'o',
+            color=(242 / 255, 206 / 255, 14 / 255, 1), markersize=10)[0]
+    initials.append([event.ydata, event.xdata])
+    fig.canvas.draw()
 
-        if splitext(dataFile)[1] == '.csv':
-            data = read_csv(dataFile, sep=',').to_numpy()
 
-            if data.shape[1] == 1 \
-                    and "\t" in data[data.shape[0]//2][0]:
-                data = read_csv(dataFile, sep='\t').to_numpy()
+def auto_plot(self):
+    """
 
-        elif splitext(dataFile)[1] == '.xlsx':
-            data = read_excel(dataFile).to_numpy()
+adds an 'initials' point for every peak found by peaks.find_initials() in the
+plotted detector channel - the same as clicking each peak by hand. Activated
+by the 'find peaks' button.
 
-        else:
-            error_msg = 'Error partitioning input data from string'
-            raise RuntimeError(error_msg)
+::
 
-    else:
-        data = dataFile
+    :param self:        (Button)
 
-    # check each position in numpy array
-    # if it can be a number, make it a number
-    for row in range(data.shape[0]):
-        for col in range(data.shape[1]):
-            try:
-                data[row, col] = float64(data[row, col])
-            except:
-                pass
+the pressed button.
 
-    # finds all rows in numpy array which aren't
-    # a part of the Nx5 data array expected.
-    #
-    # NOTE:
-    # if the file contains more/less than
-    # 5 columns this fails as the 6th row is
-    # always filled with NaN. That being said,
-    # most instruments output a Nx5 data file.
+::
 
-    set_to_del = {row for row in arange(data.shape[0]) for col in
-                  arange(data.shape[1]) if
-                  isinstance(data[row, col], (int, float)) is False
-                  or data[row, col] != data[row, col]}
+    :return:            (none)
 
-    # removes non-data rows from input array to yield the data array
-    data = delete(data, list(set_to_del), axis=0)
-    return data
+updates the matplotlib canvas visible on the application screen.
+    """
 
+    try:
+        data
+    except NameError:
+        return
 
-def add_plot(event):
+    # evenly sampled data finds its peak positions by index arithmetic
+    x_grid = data_grid(data)
+    plot_initials(find_initials(
+        None if x_grid else column(data, 0), column(data, channel),
+        x_grid=x_grid
+    ))
+
+
+def plot_initials(guesses, model=None):
     """
 
-adds an 'initials' point for each gaussian guess to  the graph. Activated by
-clicking the graph inside the borders.
+adds an 'initials' point for each of a list of guesses, as if each had been
+clicked on the graph.
 
 ::
 
-    :param event:       ('button_press_event')
+    :param guesses:     (list)
 
-takes a 'button_press_event' from the app and places a point on the graph at
-the click point, and adds that point to the initials list.
+a list of [height, position, ...] lists.
+
+::
+
+    :param model:       (str)
+
+model the guesses are complete parameter sets of, e.g. when taken from a fit.
+The first parameter isn't a height for every model (the asymmetric model's
+is its amplitude), so each point is then drawn at its peak's value at its
+position instead.
 
 ::
 
@@ -168,16 +204,16 @@ the click point, and adds that point to the initials list.
 updates the matplotlib canvas visible on the application screen.
     """
 
-    #if clicked outside of plot, dont do anyting
-    if isinstance(event.ydata, (int, float, float64)) is False or isinstance(
-            event.xdata, (int, float, float64)) is False or (
-    event.ydata, event.xdata) != (
-            event.ydata, event.xdata): return
+    if model is not None:
+        model = get_model(model)
+
+    for guess in guesses:
+        height = guess[0] if model is None \
+            else float(model.peak(guess[1], *guess[:model.size]))
+        ax.plot(guess[1], height, 'o',
+                color=(242 / 255, 206 / 255, 14 / 255, 1), markersize=10)
+        initials.append(list(guess))
 
-    # add clicked point to the list of initial parameters
-    ax.plot(event.xdata, event.ydata, 'o',
-            color=(242 / 255, 206 / 255, 14 / 255, 1), markersize=10)[0]
-    initials.append([event.ydata, event.xdata])
     fig.canvas.draw()
 
 
@@ -192,6 +228,11 @@ def pull_plot(self):
 
 def pull_all_plots(self):
 
+    global refit_base
+
+    # the cleared fit is no longer there to add new clicks to
+    refit_base = None
+
     # clears all items from plot axis, if there are any items
     if len(ax.lines) > 1:
         del ax.lines[:]
@@ -226,19 +267,61 @@ def graph_popup(self):
     App.get_running_app().graph_popup.open()
 
 
-def functionalize(data_var, initials_var, condition):
+def plot_trace():
+    """
+
+plots the selected detector channel of the imported data as a line and
+re-centers the graph on it. Called on import and when the channel is switched,
+neither of which touches the data file again.
+
+::
+
+    :return:    (none)
+
+updates the matplotlib canvas visible on the application screen.
+    """
+
+    global plot_bounds
+
+    # a UniformTrace rebuilds x on every column() call - do it once
+    x, y = column(data, 0), column(data, channel)
+
+    ax.plot(
+        x, y, '-', linewidth=2,
+        color=(0 / 255, 102 / 255, 204 / 255, 1)
+    )
+
+    plot_bounds = (x.min(), x.max(), y.min(), y.max())
+
+    ax.set_xlim(
+        plot_bounds[0] - 0.1 * (plot_bounds[1] - plot_bounds[0]),
+        plot_bounds[1] + 0.1 * (plot_bounds[1] - plot_bounds[0]))
+
+    ax.set_ylim(
+        plot_bounds[2] - 0.1 * (plot_bounds[3] - plot_bounds[2]),
+        plot_bounds[3] + 0.1 * (plot_bounds[3] - plot_bounds[2])
+    )
+
+    fig.canvas.draw()
+
+
+def functionalize(data_var, initials_var, condition, dtype=float64,
+                  channel=1, solver='leastsq', clustered=False,
+                  previous=None, starts=1, cached=False):
     """
 
 main functionalization protocol for pyGC. Takes the user inputs given via the
 GUI and initializes the least square regression analysis of the data for n-set
-of gaussian distrbutions.
+of gaussian distrbutions. The fitting itself is done by the headless
+engine.fit() - this function plots and labels its result.
 
 ::
 
-    :param data_var:        (array)
+    :param data_var:        (array); (UniformTrace)
 
 data_var is the x, y data which is derived from experimentation, passed through
-from calc_primer.
+from calc_primer - either as the data array or, if evenly sampled, as a
+UniformTrace with an implicit x axis.
 
 ::
 
@@ -255,115 +338,156 @@ defines which function the app will attempt to fit the data set with.
 
 ::
 
-    :return:                (tuple)
-                            (plot_data, ledger, val_length)
+    :param dtype:           (type)
+                            (float64); float32
 
-a len(3) tuple of the necessary data for plotting - the data of each of the
-gaussian distributions, a text ledger for each plot, and the number of
-distributions.
-    """
-    val_length = len(initials_var)
-    ledger = ['Data', 'Resultant']
+dtype of the returned plot_data. The fit itself always runs in float64.
 
-    if condition == 'Function Type: Symmetric Gaussian':
+::
 
-        for i in range(len(initials_var)):
-            initials_var[i].append(1)
+    :param channel:         (int)
 
-        vars = concatenate(initials_var)
+column of data_var holding the detector channel to fit - column 0 is always
+the x data.
 
-        def gaussian(x, a, b, c):
-            return a * exp((-(x - b) ** 2.0) / c ** 2.0)
+::
 
-        def GaussSum(x, p):
-            return sum(
-                gaussian(x, p[3 * k],
-                         p[3 * k + 1],
-                         p[3 * k + 2])
-                for k in range(val_length)
-            )
+    :param solver:          (str)
+                            ('leastsq'); 'trf'; 'sparse'
 
-    if condition == 'Function Type: Asymmetric Gaussian':
+least square solver engine.fit() uses.
+
+::
+
+    :param clustered:       (bool)
+
+fits the peak clusters between baseline gaps independently and in parallel
+with clusters.fit_clusters() instead of all peaks at once.
+
+::
 
-        for i in range(len(initials_var)):
+    :param previous:        (FitResult)
 
-            initials_var[i].append(1)
-            initials_var[i].append(0)
+converged fit of the same data. If given, and of the same model, the
+initials_var are added to it as new peaks with engine.refit().
 
-        vars = concatenate(initials_var)
+::
+
+    :param starts:          (int)
+
+number of jittered starting points searched with multistart.fit_multistart().
+The best fit is kept and the ledger shows the spread of the areas.
+
+::
 
-        def gaussian(x, a, b, c, d):
-            y = (a / (c * sqrt(2 * pi))) * exp(
-                (-(x - b) ** 2.0) / 2 * c ** 2.0) * (
-                1 + erf((d * (x - b)) / (c * sqrt(2))))
-            return y
+    :param cached:          (bool)
 
-        def GaussSum(x, p):
+looks the fit up in the fit cache first, and stores it there on a miss.
 
-            y= sum(
-                gaussian(
-                    x,
-                    p[4 * k],
-                    p[4 * k + 1],
-                    p[4 * k + 2],
-                    p[4 * k + 3])
-                for k in range(val_length))
+::
+
+    :return:                (tuple)
+                            (plot_data, ledger, val_length)
+
+a len(3) tuple of the necessary data for plotting - the data of each of the
+gaussian distributions, a text ledger for each plot, and the number of
+distributions.
+    """
+    global previous_fit, refit_base
+
+    # x is rebuilt once here, for the fit and the plot alike. The grid of
+    # evenly sampled data stands in for it wherever x would be searched
+    x_grid = data_grid(data_var)
+    x_data = column(data_var, 0)
+    y_data = column(data_var, channel)
+
+    refitting = previous is not None \
+        and previous.model == get_model(condition).name
+
+    stored = None
+    if cached:
+        key = fit_key(
+            x_grid or x_data, y_data, condition, initials_var, solver=solver,
+            clustered=clustered, starts=starts, dtype=str(dtype),
+            previous=previous.params if refitting else None
+        )
+        stored = load_fit(key)
 
-            return y
-    def residuals(p, y, x):
-        return (y - GaussSum(x, p)) ** 2
+    if stored is not None:
+        result, plot_data, ledger = stored
+    else:
+        result, plot_data, ledger = fit_ledger(
+            x_data, y_data, initials_var, condition, dtype, solver,
+            clustered, previous if refitting else None, starts, x_grid
+        )
+        if cached:
+            store_fit(key, result, plot_data, ledger)
 
-    lsq = leastsq(residuals, vars, args=(data_var[:, 1], data_var[:, 0]))
-    cnst = lsq[0]
+    val_length = len(result.areas)
+    previous_fit = refit_base = result
 
     del ax.lines[:]
     del initials[:]
 
-    plot_data = zeros((len(
-        arange(data_var[0, 0],
-               data_var[data_var.shape[0] - 1, 0] + 0.025,
-               0.025)), val_length + 2
-    ))
+    ax.plot(x_data, y_data, 'o', color='k')
+    ax.plot(plot_data[:, 0], plot_data[:, 1], color='r')
 
-    plot_data[:, 0] = arange(
-        data_var[0, 0],
-        data_var[data_var.shape[0] - 1, 0] + 0.025,
-        0.025
-    )
+    for i in range(val_length):
+        ax.plot(plot_data[:, 0], plot_data[:, i + 2])
 
-    plot_data[:, 1] = GaussSum(
-        plot_data[:, 0], cnst
-    )
+    ax.legend(ledger, fontsize=7)
 
-    ax.plot(data_var[:, 0], data_var[:, 1], 'o', color='k')
-    ax.plot(plot_data[:, 0], plot_data[:, 1], color='r')
+    fig.canvas.draw()
 
-    areas = []
+    App.get_running_app().graph_popup.open()
 
-    if condition == 'Function Type: Symmetric Gaussian':
+    return plot_data, ledger, val_length
 
-        for i in range(val_length):
 
-            plot_data[:, i + 2] = gaussian(
-                plot_data[:, 0], cnst[3 * i],
-                cnst[3 * i + 1], cnst[3 * i + 2]
-            )
+def fit_ledger(x_data, y_data, initials_var, condition, dtype, solver,
+               clustered, previous, starts, x_grid=None):
+    """
 
-            ax.plot(plot_data[:, 0], plot_data[:, i + 2])
+runs the fit functionalize() asked for and labels it - the part of
+functionalize() a fit cache hit skips. Parameters as for functionalize(),
+previous only being given when it is to be refitted, and x_grid being the
+(x0, dx) grid of evenly sampled data from trace.data_grid().
 
-        for i in range(val_length):
+::
 
-            areas.append(
-                quad(
-                    gaussian, data_var[0, 0],
-                    data_var[data_var.shape[0] - 1, 0],
-                    args=(
-                        cnst[3 * i],
-                        cnst[3 * i + 1],
-                        cnst[3 * i + 2]
-                    )
-                )[0]
-            )
+    :return:                (tuple)
+                            (result, plot_data, ledger)
+
+the FitResult, its plot_data and the ledger labelling each curve.
+    """
+    ledger = ['Data', 'Resultant']
+    search = None
+
+    if previous is not None:
+        result = refit(
+            previous, x_data, y_data, initials_var, solver=solver,
+            x_grid=x_grid
+        )
+    elif starts > 1:
+        search = fit_multistart(
+            x_data, y_data, initials_var, condition, solver=solver,
+            starts=starts, x_grid=x_grid
+        )
+        result = search.best
+    else:
+        fitter = fit_clusters if clustered else fit
+        result = fitter(
+            x_data, y_data, initials_var, condition, solver=solver,
+            x_grid=x_grid
+        )
+
+    val_length = len(result.areas)
+    cnst = result.params
+    areas = result.areas
+
+    plot_data = result.plot_data(dtype=dtype, x_grid=x_grid)
+
+    if condition == 'Function Type: Symmetric Gaussian':
 
         for i in range(val_length):
             ledger.append(str(round(cnst[3 * i + 1], 2)) + '$e^{(x-' + str(
@@ -372,29 +496,21 @@ distributions.
                 round(areas[i], 3)))
 
     if condition == 'Function Type: Asymmetric Gaussian':
-        for i in range(val_length):
-            plot_data[:, i + 2] = gaussian(plot_data[:, 0], cnst[4 * i],
-                                           cnst[4 * i + 1],
-                                           cnst[4 * i + 2],
-                                           cnst[4 * i + 3])
-            ax.plot(plot_data[:, 0], plot_data[:, i + 2])
-
-        for i in range(val_length):
-            areas.append(quad(gaussian, data_var[0, 0],
-                              data_var[data_var.shape[0] - 1, 0], args=(
-                cnst[4 * i], cnst[4 * i + 1], cnst[4 * i + 2],
-                cnst[4 * i + 3]))[0])
 
         for i in range(val_length):
             ledger.append('Area = ' + str(round(areas[i], 3)))
 
-    ax.legend(ledger, fontsize=7)
-
-    fig.canvas.draw()
+    if search is not None:
+        ledger[1] += ', best of ' + str(search.minima) + ' minima'
 
-    App.get_running_app().graph_popup.open()
+        # spread over the candidates which agree on the best fit - with only
+        # the one there is nothing to show
+        if search.settled.sum() > 1:
+            area_spread = search.area_spread
+            for i in range(val_length):
+                ledger[i + 2] += ' $\\pm$ ' + str(round(area_spread[i], 3))
 
-    return plot_data, ledger, val_length
+    return result, plot_data, ledger
 
 
 class file_popup(Popup):
@@ -429,37 +545,272 @@ Presents the file_popup from FileBrowser.
         file_popup.dismiss(self)
         file = instance.selection
 
-        global data, plot_bounds, file_location_name
+        # parse on a worker thread so the window keeps responding - the
+        # result is handed back to the kivy thread by import_done()
+        progress_popup = App.get_running_app().import_popup
+        cancelled = progress_popup.start(file[0])
 
-        data = calc_primer(file[0])
-        file_location_name = splitext(file[0])[0]
+        Thread(
+            target=self.import_file,
+            args=(file[0], progress_popup, cancelled), daemon=True
+        ).start()
 
-        pull_all_plots(self)
+    def import_file(self, path, progress_popup, cancelled):
+        """
 
-        ax.plot(
-            data[:, 0], data[:, 1], '-', linewidth=2,
-            color=(0 / 255, 102 / 255, 204 / 255, 1)
-        )
+worker thread body of an import. Parses the file and converts it to the
+stored layout, reporting progress to the import popup as it goes.
 
-        plot_bounds = (
-        min(data[:, 0]), max(data[:, 0]), min(data[:, 1]), max(data[:, 1])
-        )
+::
+
+        :param path:            (str)
+
+directory and file name of the selected data file.
+
+::
+
+        :param progress_popup:  (import_popup)
+
+popup showing the progress.
+
+::
+
+        :param cancelled:       (Event)
+
+cancel flag of this import. Each import gets its own, so a cancelled import
+still winding down never picks up the flag of the next one.
+
+::
 
-        ax.set_xlim(
-            plot_bounds[0] - 0.1 * (plot_bounds[1] - plot_bounds[0]),
-            plot_bounds[1] + 0.1 * (plot_bounds[1] - plot_bounds[0]))
+        :return:                (none)
 
-        ax.set_ylim(
-            plot_bounds[2] - 0.1 * (plot_bounds[3] - plot_bounds[2]),
-            plot_bounds[3] + 0.1 * (plot_bounds[3] - plot_bounds[2])
+schedules import_done() on the kivy thread once the data is ready.
+        """
+
+        try:
+            raw = cached_primer(
+                path, progress=partial(progress_popup.report, cancelled)
+            )
+
+            # evenly sampled data drops its x column for an implicit grid.
+            # either way the channels are column-major, so switching
+            # detector channels reads one contiguous column
+            imported = uniform_trace(raw, dtype=STORAGE_DTYPE) \
+                or asfortranarray(raw, dtype=STORAGE_DTYPE)
+            del raw
+
+        except ImportCancelled:
+            # cancel() has closed the popup already
+            return
+
+        except Exception as error:
+            message = str(error)
+            Clock.schedule_once(
+                lambda dt: progress_popup.failed(cancelled, message)
+            )
+            return
+
+        Clock.schedule_once(
+            lambda dt: self.import_done(
+                path, imported, progress_popup, cancelled
+            )
         )
 
-        fig.canvas.draw()
+    def import_done(self, path, imported, progress_popup, cancelled):
+        """
+
+swaps the freshly imported data in and plots it. Runs on the kivy thread.
+
+::
+
+        :param path:            (str)
+
+directory and file name of the imported data file.
+
+::
+
+        :param imported:        (array); (UniformTrace)
+
+the parsed data.
+
+::
+
+        :param progress_popup:  (import_popup)
+
+popup showing the progress of the import, closed here.
+
+::
+
+        :param cancelled:       (Event)
+
+cancel flag of this import.
+
+::
+
+        :return:                (none)
+
+updates the matplotlib canvas visible on the application screen.
+        """
+
+        global data, file_location_name, channel, refit_base
+
+        # a cancel which came in after the last progress report still counts.
+        # the popup may already be showing a newer import then - leave it be
+        if cancelled.is_set():
+            return
+
+        progress_popup.dismiss()
+
+        data = imported
+        file_location_name = splitext(path)[0]
+        refit_base = None
+
+        # fall back to the first channel if the new file has fewer columns
+        if channel >= data.shape[1]:
+            channel = 1
+            App.get_running_app().root.body.ids.channel.text = \
+                'Detector Channel: 1'
+
+        pull_all_plots(self)
+        plot_trace()
+
+        # sequence mode - start the new run from the last fit, re-aligned
+        if WARM_START and previous_fit is not None:
+            x_grid = data_grid(data)
+            plot_initials(warm_initials(
+                previous_fit, None if x_grid else column(data, 0),
+                column(data, channel), x_grid=x_grid
+            ), model=previous_fit.model)
 
     def file_browser_canceled(self, instance):
         file_popup.dismiss(self)
 
 
+class import_popup(Popup):
+    """
+
+progress popup shown while a data file is imported on a worker thread.
+Reports bytes read and rows parsed, and lets the user cancel the import.
+    """
+
+    def __init__(self, **kwargs):
+        super(import_popup, self).__init__(**kwargs)
+        self.cancelled = Event()
+
+    def start(self, path):
+        """
+
+resets and opens the popup for a new import.
+
+::
+
+        :param path:    (str)
+
+directory and file name of the file being imported.
+
+::
+
+        :return:        (Event)
+
+cancel flag of the new import, set by cancel().
+        """
+        self.cancelled = Event()
+        self.title = 'Importing ' + basename(path)
+        self.ids.bar.value = 0
+        self.ids.status.text = 'Reading...'
+        self.ids.cancel.text = 'Cancel'
+        self.open()
+        return self.cancelled
+
+    def report(self, cancelled, bytes_read, total_bytes, rows):
+        """
+
+progress callback handed to calc_primer(), with the import's cancel flag bound
+in - runs on the worker thread, so it only schedules the display update on the
+kivy thread.
+
+::
+
+        :param cancelled:   (Event)
+
+cancel flag of the import reporting.
+
+::
+
+        :param bytes_read:  (int)
+        :param total_bytes: (int)
+        :param rows:        (int)
+
+progress of the import.
+
+::
+
+        :return:            (none)
+
+raises ImportCancelled once the user has pressed cancel, which unwinds the
+worker thread.
+        """
+        if cancelled.is_set():
+            raise ImportCancelled()
+
+        Clock.schedule_once(
+            lambda dt: self.show_progress(
+                cancelled, bytes_read, total_bytes, rows
+            )
+        )
+
+    def show_progress(self, cancelled, bytes_read, total_bytes, rows):
+        # display side of report(), on the kivy thread - skipped if the
+        # import was cancelled since, as the popup may show another by now
+        if cancelled.is_set():
+            return
+
+        self.ids.bar.value = 100 * bytes_read / max(total_bytes, 1)
+        self.ids.status.text = '{:.1f} of {:.1f} MB read, {} rows'.format(
+            bytes_read / 1024 ** 2, total_bytes / 1024 ** 2, rows
+        )
+
+    def failed(self, cancelled, message):
+        """
+
+shows why an import failed, leaving the popup open until dismissed.
+
+::
+
+        :param cancelled:   (Event)
+
+cancel flag of the failed import - a cancelled import fails silently.
+
+::
+
+        :param message:     (str)
+
+text of the error raised while reading the file.
+
+::
+
+        :return:            (none)
+        """
+        if cancelled.is_set():
+            return
+
+        self.ids.status.text = 'Import failed: ' + message
+        self.ids.cancel.text = 'Close'
+
+    def cancel(self):
+        """
+
+flags the running import to stop at its next progress report and closes the
+popup. The application itself keeps running.
+
+::
+
+        :return:            (none)
+        """
+        self.cancelled.set()
+        self.dismiss()
+
+
 class graph_options(Popup):
     """
 
@@ -671,13 +1022,17 @@ interaction.
     def __init__(self, **kwargs):
         """
 
-adds three buttons to the window on initialization.
+adds four buttons to the window on initialization.
+- :code:`find peaks`: places an initial guess on every detected peak.
 - :code:`clear last object`: removes from the graph the last added object.
 - :code:`clear graph`: removes all objects from the graph.
 - :code:`graph options`: opens the graph_options menu.
         """
         super(GraphButtons, self).__init__(**kwargs)
         self.size_hint_y = 0.1
+        self.add_widget(
+            Button(text='find peaks', on_release=auto_plot)
+        )
         self.add_widget(
             Button(text='clear last object', on_release=pull_plot)
         )
@@ -742,9 +1097,72 @@ the function.
         plot_data_global = functionalize(
             data_var=data,
             initials_var=initials,
-            condition=self.ids.condition.text
+            condition=self.ids.condition.text,
+            dtype=STORAGE_DTYPE,
+            channel=channel,
+            solver=SOLVER,
+            clustered=CLUSTERED,
+            previous=refit_base if INCREMENTAL else None,
+            starts=STARTS,
+            cached=CACHE_FITS
         )
 
+    def channel_values(self):
+        """
+
+lists the detector channels of the imported data for the channel spinner.
+
+::
+
+        :return:    (list)
+
+one spinner entry per column of the data past the x column.
+        """
+        try:
+            count = data.shape[1] - 1
+        except NameError:
+            count = 1
+
+        return [
+            'Detector Channel: ' + str(i) for i in range(1, count + 1)
+        ]
+
+    def select_channel(self, text):
+        """
+
+switches the detector channel which is plotted and fit, from the already
+imported data.
+
+::
+
+        :param text:    (str)
+
+text of the chosen channel spinner entry.
+
+::
+
+        :return:    (none)
+
+redraws the graph with the chosen channel.
+        """
+
+        global channel, refit_base
+
+        # already showing - e.g. the spinner being reset by import_done()
+        if int(text.split(': ')[1]) == channel:
+            return
+
+        channel = int(text.split(': ')[1])
+        refit_base = None
+
+        try:
+            data
+        except NameError:
+            return
+
+        pull_all_plots(self)
+        plot_trace()
+
     def reset_app(self):
         """
 
@@ -775,7 +1193,8 @@ blocks of widgets:
         super(Meta, self).__init__(**kwargs)
         self.add_widget(graph())
         self.add_widget(GraphButtons())
-        self.add_widget(Body())
+        self.body = Body()
+        self.add_widget(self.body)
 
 
 class GC_decon(App):
@@ -783,8 +1202,10 @@ class GC_decon(App):
 
 class which inherits from the Kivy App to initialze the applicaiton.
     """
-    global initials
+    global initials, channel, previous_fit, refit_base
     initials = []
+    channel = 1
+    previous_fit = refit_base = None
 
     Builder.load_string(kivy_build.KVlang)
 
@@ -802,6 +1223,7 @@ returns the Meta() class to the App.
         self.help_popup = help_popup()
         self.graph_popup = graph_options()
         self.file_popup = file_popup()
+        self.import_popup = import_popup()
         return Meta()
 
 
@@ -0,0 +1,323 @@
+"""
+:code:`batch.py`
+================
+
+batch loading and fitting for sequence runs - reads a whole directory of GC
+data files through calc_primer() across a pool of processes and packs the
+results into one compact structure instead of a list of separate arrays, then
+fits every chromatogram of it across a pool of processes which read the data
+from shared memory.
+
+"""
+
+from collections import namedtuple
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from multiprocessing.shared_memory import SharedMemory
+
+from os import listdir, cpu_count
+
+from os.path import join, splitext, isfile
+
+from numpy import (
+    array_equal, cumsum, empty, float64, int64, column_stack, ndarray
+)
+
+from pyGC.ingest import calc_primer
+from pyGC.engine import fit
+
+
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.npy', '.cdf')
+
+
+class ChromatogramBatch(namedtuple(
+        'ChromatogramBatch', ['files', 'offsets', 'x', 'y', 'shared_x'])):
+    """
+
+stack of chromatograms loaded by load_directory().
+
+- :code:`files`: the data files, in load order.
+- :code:`offsets`: int64 array of len(files) + 1 - chromatogram i spans
+  y[offsets[i]:offsets[i + 1]].
+- :code:`x`: the one x grid every chromatogram shares if shared_x is True,
+  otherwise a flat buffer lined up with y.
+- :code:`y`: flat buffer of every chromatogram's y values. With a
+  shared x grid it can be viewed as y.reshape(len(files), -1) for free.
+- :code:`shared_x`: whether all chromatograms were sampled on the same grid.
+    """
+
+    __slots__ = ()
+
+    def chromatogram(self, i):
+        """
+
+rebuilds one chromatogram of the batch in calc_primer() layout.
+
+::
+
+        :param i:       (int)
+
+index of the chromatogram in files.
+
+::
+
+        :return:        (array)
+
+Nx2 data array of chromatogram i.
+        """
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        x = self.x if self.shared_x else self.x[start:stop]
+        return column_stack((x, self.y[start:stop]))
+
+
+def load_directory(directory, workers=None, extensions=DATA_EXTENSIONS,
+                   dtype=float64):
+    """
+
+loads every GC data file in a directory in parallel.
+
+::
+
+    :param directory:   (str)
+
+directory holding the data files of the sequence. Files are loaded in sorted
+name order.
+
+::
+
+    :param workers:     (int)
+
+number of worker processes. None uses one per core.
+
+::
+
+    :param extensions:  (tuple)
+
+file extensions picked up from the directory.
+
+::
+
+    :param dtype:       (type)
+
+dtype of the x and y buffers - float32 halves the memory of the batch.
+
+::
+
+    :return:            (ChromatogramBatch)
+
+the x and y columns of every file packed into flat buffers.
+    """
+
+    files = sorted(
+        join(directory, name) for name in listdir(directory)
+        if splitext(name)[1] in extensions
+        and isfile(join(directory, name))
+    )
+
+    return load_files(files, workers=workers, dtype=dtype)
+
+
+def load_files(files, workers=None, dtype=float64):
+    """
+
+loads a list of GC data files in parallel.
+
+::
+
+    :param files:       (list)
+
+directory and file names of the data files to load.
+
+::
+
+    :param workers:     (int)
+
+number of worker processes. None uses one per core.
+
+::
+
+    :param dtype:       (type)
+
+dtype of the x and y buffers - float32 halves the memory of the batch.
+
+::
+
+    :return:            (ChromatogramBatch)
+
+the x and y columns of every file packed into flat buffers.
+    """
+
+    workers = workers or cpu_count() or 1
+
+    # hand each process a few files at a time to keep the pickling
+    # round-trips down on sequences of hundreds of small files
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        arrays = list(pool.map(
+            calc_primer, files,
+            chunksize=max(1, len(files) // (4 * workers))
+        ))
+
+    lengths = [data.shape[0] for data in arrays]
+    offsets = empty(len(arrays) + 1, dtype=int64)
+    offsets[0] = 0
+    cumsum(lengths, out=offsets[1:])
+
+    shared_x = len(arrays) > 0 and all(
+        array_equal(data[:, 0], arrays[0][:, 0]) for data in arrays[1:]
+    )
+
+    y = empty(offsets[-1], dtype=dtype)
+    x = arrays[0][:, 0].astype(dtype) if shared_x \
+        else empty(offsets[-1], dtype=dtype)
+
+    for i, data in enumerate(arrays):
+        y[offsets[i]:offsets[i + 1]] = data[:, 1]
+        if not shared_x:
+            x[offsets[i]:offsets[i + 1]] = data[:, 0]
+
+    return ChromatogramBatch(list(files), offsets, x, y, shared_x)
+
+
+def fit_batch(batch, initials, model='Symmetric Gaussian', solver='leastsq',
+              workers=None):
+    """
+
+fits every chromatogram of a batch in parallel. The x and y buffers are
+copied once into shared memory which the worker processes read in place, so
+no chromatogram is pickled on its way to a worker.
+
+::
+
+    :param batch:       (ChromatogramBatch)
+
+chromatograms to fit, as loaded by load_directory() or load_files().
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists used for every chromatogram, or a
+list of such lists - one per chromatogram of the batch.
+
+::
+
+    :param model:       (str)
+
+model to fit, see engine.get_model().
+
+::
+
+    :param solver:      (str)
+
+least square solver, see engine.fit().
+
+::
+
+    :param workers:     (int)
+
+number of worker processes. None uses one per core.
+
+::
+
+    :return:            (generator)
+
+yields (index, FitResult) pairs in the order the fits complete, index being
+the chromatogram's position in batch.files.
+    """
+
+    per_run = len(initials) > 0 and isinstance(initials[0][0], (list, tuple))
+    runs = len(batch.files)
+
+    x_memory = SharedMemory(create=True, size=max(batch.x.nbytes, 1))
+    y_memory = SharedMemory(create=True, size=max(batch.y.nbytes, 1))
+
+    try:
+        ndarray(batch.x.shape, batch.x.dtype, x_memory.buf)[:] = batch.x
+        ndarray(batch.y.shape, batch.y.dtype, y_memory.buf)[:] = batch.y
+
+        x_block = (x_memory.name, batch.x.shape, batch.x.dtype.str)
+        y_block = (y_memory.name, batch.y.shape, batch.y.dtype.str)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = {
+                pool.submit(
+                    fit_shared, x_block, y_block,
+                    int(batch.offsets[i]), int(batch.offsets[i + 1]),
+                    batch.shared_x, initials[i] if per_run else initials,
+                    model, solver
+                ): i
+                for i in range(runs)
+            }
+
+            for job in as_completed(jobs):
+                yield jobs[job], job.result()
+
+    finally:
+        x_memory.close()
+        x_memory.unlink()
+        y_memory.close()
+        y_memory.unlink()
+
+
+def fit_shared(x_block, y_block, start, stop, shared_x, initials, model,
+               solver):
+    """
+
+worker of fit_batch() - fits one chromatogram straight from the batch's
+shared memory blocks.
+
+::
+
+    :param x_block:     (tuple)
+    :param y_block:     (tuple)
+
+(name, shape, dtype) of the shared x and y buffers.
+
+::
+
+    :param start:       (int)
+    :param stop:        (int)
+
+the chromatogram's span of the y buffer - and of the x buffer, unless the
+batch shares one x grid.
+
+::
+
+    :param shared_x:    (bool)
+
+whether the x buffer is the one grid every chromatogram shares.
+
+::
+
+    :param initials:    (list)
+    :param model:       (str)
+    :param solver:      (str)
+
+passed on to engine.fit().
+
+::
+
+    :return:            (FitResult)
+    """
+
+    x_memory = SharedMemory(name=x_block[0])
+    y_memory = SharedMemory(name=y_block[0])
+
+    try:
+        x = ndarray(x_block[1], x_block[2], x_memory.buf)
+        y = ndarray(y_block[1], y_block[2], y_memory.buf)
+
+        result = fit(
+            x if shared_x else x[start:stop], y[start:stop],
+            initials, model, solver=solver
+        )
+
+        # the views must go before the blocks can be closed
+        del x, y
+
+    finally:
+        x_memory.close()
+        y_memory.close()
+
+    return result
@@ -0,0 +1,397 @@
+"""
+:code:`cache.py`
+================
+
+persistent cache of parsed GC data. The first import of a data file goes
+through calc_primer() as usual, and the cleaned array is stored in pyGC's
+binary format in a cache directory - every later import of the same, unchanged
+file is memory-mapped straight back from there.
+
+Fits are cached too, in memory and on disk, keyed by the data, the model, the
+initial guesses and the solver settings - refitting the same chromatogram with
+the same clicks hands back the stored result without solving anything.
+
+"""
+
+from collections import OrderedDict
+
+from hashlib import blake2b
+
+from os import makedirs, listdir, remove, replace, stat, utime, getpid
+
+from os.path import abspath, expanduser, join, splitext, exists
+
+from numpy import (
+    asfortranarray, ascontiguousarray, asarray, float64, save, savez, load,
+    ndarray
+)
+
+from pyGC.ingest import calc_primer, load_binary
+from pyGC.engine import FitResult
+
+
+CACHE_DIR = join(expanduser('~'), '.pyGC', 'cache')
+
+# total size of the cached arrays before the least recently used get evicted
+CACHE_LIMIT = 512 * 1024 ** 2
+
+# bytes hashed from each end of a data file to fingerprint its contents
+HASH_BYTES = 1024 ** 2
+
+FIT_CACHE_DIR = join(expanduser('~'), '.pyGC', 'fits')
+
+# total size of the cached fits on disk, and number of fits kept in memory
+FIT_CACHE_LIMIT = 64 * 1024 ** 2
+FIT_MEMORY_ENTRIES = 32
+
+# significant digits the initial guesses are rounded to before hashing, so
+# float noise in the clicks doesn't miss the cache
+INITIALS_DIGITS = 6
+
+# in-memory level of the fit cache, least recently used first
+fit_memory = OrderedDict()
+
+
+def cache_key(dataFile):
+    """
+
+fingerprints a data file by its path, size, modification time and a hash of
+the bytes at its head and tail - cheap enough to compute on every import no
+matter how large the file is.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the data file.
+
+::
+
+    :return:            (str)
+
+hex digest naming the file's entry in the cache directory.
+    """
+
+    info = stat(dataFile)
+    digest = blake2b(digest_size=20)
+    digest.update(abspath(dataFile).encode('utf-8', errors='replace'))
+    digest.update(str((info.st_size, info.st_mtime_ns)).encode())
+
+    with open(dataFile, 'rb') as f:
+        digest.update(f.read(HASH_BYTES))
+        if info.st_size > 2 * HASH_BYTES:
+            f.seek(-HASH_BYTES, 2)
+            digest.update(f.read(HASH_BYTES))
+
+    return digest.hexdigest()
+
+
+def cached_primer(dataFile, cache_dir=None, limit=None, progress=None):
+    """
+
+drop-in replacement for calc_primer() which parses a given data file only the
+first time it is seen.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of a .csv or .xlsx GC data file. Anything else (arrays,
+.npy files) is passed through to calc_primer() uncached.
+
+::
+
+    :param cache_dir:   (str)
+
+directory the parsed arrays are stored in. Defaults to CACHE_DIR.
+
+::
+
+    :param limit:       (int)
+
+size in bytes the cache directory is trimmed to after a new entry is written.
+Defaults to CACHE_LIMIT.
+
+::
+
+    :param progress:    (callable)
+
+progress callback passed on to calc_primer() on a cache miss.
+
+::
+
+    :return:            (array)
+
+refactored data set of Nx2 dimensionality in numpy array
+    """
+
+    if not isinstance(dataFile, str) \
+            or splitext(dataFile)[1] not in ('.csv', '.xlsx'):
+        return calc_primer(dataFile, progress=progress)
+
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    limit = CACHE_LIMIT if limit is None else limit
+    cache_file = join(cache_dir, cache_key(dataFile) + '.npy')
+
+    if exists(cache_file):
+        # bump the modification time - it doubles as the LRU clock
+        utime(cache_file)
+        return load_binary(cache_file)
+
+    data = calc_primer(dataFile, progress=progress)
+
+    makedirs(cache_dir, exist_ok=True)
+
+    # write under a temporary name first so a half-written entry is never
+    # picked up by another pyGC process
+    partial = cache_file + '.' + str(getpid()) + '.part.npy'
+    save(partial, asfortranarray(data, dtype=float64))
+    replace(partial, cache_file)
+
+    evict(cache_dir, limit)
+
+    return data
+
+
+def evict(cache_dir=None, limit=None, suffix='.npy'):
+    """
+
+removes the least recently used entries from the cache directory until the
+entries left fit inside the size limit.
+
+::
+
+    :param cache_dir:   (str)
+
+directory the parsed arrays are stored in. Defaults to CACHE_DIR.
+
+::
+
+    :param limit:       (int)
+
+size in bytes to trim the cache directory to. Defaults to CACHE_LIMIT.
+
+::
+
+    :param suffix:      (str)
+
+file extension of the entries - '.npz' for the fit cache.
+
+::
+
+    :return:            (none)
+    """
+
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    limit = CACHE_LIMIT if limit is None else limit
+
+    if not exists(cache_dir):
+        return
+
+    entries = []
+    for name in listdir(cache_dir):
+        if name.endswith(suffix) and not name.endswith('.part' + suffix):
+            info = stat(join(cache_dir, name))
+            entries.append((info.st_mtime_ns, info.st_size, name))
+
+    entries.sort()
+    total = sum(entry[1] for entry in entries)
+
+    for _, size, name in entries:
+        if total <= limit:
+            break
+        try:
+            remove(join(cache_dir, name))
+        except OSError:
+            continue
+        total -= size
+
+
+def fit_key(x, y, condition, initials, **settings):
+    """
+
+fingerprints a fit by everything its result depends on.
+
+::
+
+    :param x:           (array); (tuple)
+    :param y:           (array)
+
+x and y data being fitted - hashed in full. Evenly sampled x can be given as
+its (x0, dx) grid instead, see trace.data_grid(), which is hashed in place of
+the rebuilt x.
+
+::
+
+    :param condition:   (str)
+
+model name, as passed to engine.fit().
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists, rounded to INITIALS_DIGITS
+significant digits.
+
+::
+
+    :param settings:    (keywords)
+
+solver settings and anything else the result depends on. Array values are
+hashed by their contents.
+
+::
+
+    :return:            (str)
+
+hex digest naming the fit's entry in the cache.
+    """
+
+    digest = blake2b(digest_size=20)
+    if isinstance(x, tuple):
+        digest.update(repr((float(x[0]), float(x[1]), len(y))).encode())
+    else:
+        digest.update(ascontiguousarray(x, dtype=float64).data)
+    digest.update(ascontiguousarray(y, dtype=float64).data)
+
+    digest.update(condition.encode('utf-8', errors='replace'))
+    digest.update(str([
+        ['%.*g' % (INITIALS_DIGITS, value) for value in guess]
+        for guess in initials
+    ]).encode())
+
+    for name in sorted(settings):
+        value = settings[name]
+        digest.update(name.encode())
+        if isinstance(value, ndarray):
+            digest.update(str(value.dtype).encode())
+            digest.update(ascontiguousarray(value).data)
+        else:
+            digest.update(repr(value).encode())
+
+    return digest.hexdigest()
+
+
+def load_fit(key, cache_dir=None):
+    """
+
+looks a fit up in memory, then on disk.
+
+::
+
+    :param key:         (str)
+
+the fit's fit_key().
+
+::
+
+    :param cache_dir:   (str)
+
+directory the fits are stored in. Defaults to FIT_CACHE_DIR.
+
+::
+
+    :return:            (tuple)
+
+(FitResult, plot_data, ledger) as given to store_fit(), or None on a miss.
+    """
+
+    if key in fit_memory:
+        fit_memory.move_to_end(key)
+        result, plot_data, ledger = fit_memory[key]
+        # a fresh ledger list - callers relabel it for export
+        return result, plot_data, list(ledger)
+
+    cache_dir = FIT_CACHE_DIR if cache_dir is None else cache_dir
+    cache_file = join(cache_dir, key + '.npz')
+
+    if not exists(cache_file):
+        return None
+
+    try:
+        with load(cache_file) as stored:
+            entry = (
+                FitResult(
+                    str(stored['model']), stored['params'], stored['areas'],
+                    tuple(stored['x_range'].tolist()),
+                    int(stored['nfev']), int(stored['ier'])
+                ),
+                stored['plot_data'],
+                stored['ledger'].tolist()
+            )
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # bump the modification time - it doubles as the LRU clock
+    utime(cache_file)
+    remember_fit(key, (entry[0], entry[1], list(entry[2])))
+
+    return entry
+
+
+def store_fit(key, result, plot_data, ledger, cache_dir=None, limit=None):
+    """
+
+stores a fit in memory and on disk.
+
+::
+
+    :param key:         (str)
+
+the fit's fit_key().
+
+::
+
+    :param result:      (FitResult)
+    :param plot_data:   (array)
+    :param ledger:      (list)
+
+the fit, its plot data and the ledger strings labelling it.
+
+::
+
+    :param cache_dir:   (str)
+
+directory the fits are stored in. Defaults to FIT_CACHE_DIR.
+
+::
+
+    :param limit:       (int)
+
+size in bytes the directory is trimmed to after the entry is written.
+Defaults to FIT_CACHE_LIMIT.
+
+::
+
+    :return:            (none)
+    """
+
+    remember_fit(key, (result, plot_data, list(ledger)))
+
+    cache_dir = FIT_CACHE_DIR if cache_dir is None else cache_dir
+    limit = FIT_CACHE_LIMIT if limit is None else limit
+    cache_file = join(cache_dir, key + '.npz')
+
+    makedirs(cache_dir, exist_ok=True)
+
+    # same write-then-rename as cached_primer()
+    partial = cache_file + '.' + str(getpid()) + '.part.npz'
+    with open(partial, 'wb') as f:
+        savez(
+            f, model=asarray(result.model), params=result.params,
+            areas=result.areas, x_range=asarray(result.x_range),
+            nfev=asarray(result.nfev), ier=asarray(result.ier),
+            plot_data=plot_data, ledger=asarray(list(ledger), dtype=str)
+        )
+    replace(partial, cache_file)
+
+    evict(cache_dir, limit, suffix='.npz')
+
+
+def remember_fit(key, entry):
+    # in-memory level - drop the least recently used beyond the entry limit
+    fit_memory[key] = entry
+    fit_memory.move_to_end(key)
+    while len(fit_memory) > FIT_MEMORY_ENTRIES:
+        fit_memory.popitem(last=False)
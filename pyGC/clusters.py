@@ -0,0 +1,205 @@
+"""
+:code:`clusters.py`
+===================
+
+independent peak-cluster fitting. Groups of peaks separated by flat baseline
+don't influence each other, so rather than one global least square problem
+over every peak, the chromatogram is split at its baseline gaps, each cluster
+is fitted on its own slice of the data - in parallel across cores - and the
+results are stitched back into a single FitResult.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from numpy import (
+    asarray, float64, median, flatnonzero,
+    diff, searchsorted, empty, concatenate
+)
+
+from pyGC.engine import fit, get_model, FitResult
+from pyGC.trace import grid_span
+
+
+# fraction of the signal's height above baseline below which a sample counts
+# as baseline, and the fewest consecutive baseline samples that split peaks
+BASELINE_FRACTION = 0.01
+MIN_GAP = 3
+
+
+def split_clusters(x, y, positions, fraction=BASELINE_FRACTION,
+                   min_gap=MIN_GAP, x_grid=None):
+    """
+
+splits a chromatogram at its baseline gaps and assigns peaks to the pieces.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram, x in ascending order.
+
+::
+
+    :param positions:   (list)
+
+position of every peak to be fitted.
+
+::
+
+    :param fraction:    (float)
+
+samples below baseline + fraction * (max - baseline) count as baseline, the
+baseline being the median of y.
+
+::
+
+    :param min_gap:     (int)
+
+fewest consecutive baseline samples which separate two clusters.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of x if it is evenly sampled, see engine.fit(). Peaks are then
+assigned to clusters by index arithmetic rather than by searching x.
+
+::
+
+    :return:            (list)
+
+(lo, hi, peaks) per cluster - the slice x[lo:hi] it is fitted on and the
+indices of its peaks in positions. Clusters without peaks are left out.
+    """
+    baseline = median(y)
+    above = flatnonzero(y > baseline + fraction * (y.max() - baseline))
+
+    if above.shape[0] == 0:
+        cuts = asarray([], dtype=int)
+    else:
+        # signal runs separated by at least min_gap baseline samples - cut
+        # halfway across each gap so both clusters keep some baseline
+        gaps = flatnonzero(diff(above) > min_gap)
+        cuts = (above[gaps] + above[gaps + 1] + 1) // 2
+
+    edges = concatenate(([0], cuts, [x.shape[0]]))
+    positions = asarray(positions, dtype=float64)
+
+    if x_grid is not None:
+        # the cuts at or before each position - samples up to it are [0, stop)
+        stop = grid_span(x_grid, positions, positions, x.shape[0])[1]
+        owner = searchsorted(cuts, stop)
+    else:
+        owner = searchsorted(x[cuts], positions, side='right')
+
+    clusters = []
+    for i in range(edges.shape[0] - 1):
+        peaks = flatnonzero(owner == i).tolist()
+        if peaks:
+            clusters.append((int(edges[i]), int(edges[i + 1]), peaks))
+
+    return clusters
+
+
+def fit_clusters(x, y, initials, model='Symmetric Gaussian', solver='leastsq',
+                 workers=None, fraction=BASELINE_FRACTION, min_gap=MIN_GAP,
+                 x_grid=None):
+    """
+
+fits every peak cluster of a chromatogram on its own and stitches the results
+together - a drop-in replacement for engine.fit() on well separated peaks.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram, x in ascending order.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists - one per peak, as for fit().
+
+::
+
+    :param model:       (str)
+
+model to fit, see engine.get_model().
+
+::
+
+    :param solver:      (str)
+
+solver each cluster is fitted with, see engine.fit().
+
+::
+
+    :param workers:     (int)
+
+number of worker processes. None uses one per core, 1 fits the clusters one
+after the other in this process.
+
+::
+
+    :param fraction:    (float)
+    :param min_gap:     (int)
+
+baseline detection settings, see split_clusters().
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of x if it is evenly sampled, see engine.fit(). Handed on to the
+split and, for its own slice, to each cluster's fit.
+
+::
+
+    :return:            (FitResult)
+
+one result covering every peak, in the order of initials. Areas are
+integrated over the full range of x, as fit() does. nfev is summed over the
+clusters and ier is the first failing cluster's flag, if any.
+    """
+    model = get_model(model)
+    x = asarray(x, dtype=float64)
+    y = asarray(y, dtype=float64)
+
+    clusters = split_clusters(
+        x, y, [guess[1] for guess in initials], fraction, min_gap, x_grid
+    )
+    x_range = (float(x[0]), float(x[-1]))
+
+    jobs = [
+        (x[lo:hi], y[lo:hi], [initials[i] for i in peaks], model.name,
+         x_range, solver,
+         None if x_grid is None else (x_grid[0] + lo * x_grid[1], x_grid[1]))
+        for lo, hi, peaks in clusters
+    ]
+
+    if workers == 1 or len(jobs) < 2:
+        results = [fit(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit, *zip(*jobs)))
+
+    params = empty(len(initials) * model.size, dtype=float64)
+    areas = empty(len(initials), dtype=float64)
+
+    for (_, _, peaks), result in zip(clusters, results):
+        for row, i in enumerate(peaks):
+            params[model.size * i:model.size * (i + 1)] = result.peaks[row]
+            areas[i] = result.areas[row]
+
+    iers = [result.ier for result in results]
+    failed = [ier for ier in iers if ier not in (1, 2, 3, 4)]
+
+    return FitResult(
+        model.name, params, areas, x_range,
+        sum(result.nfev for result in results),
+        failed[0] if failed else (iers[0] if iers else 1)
+    )
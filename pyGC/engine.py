@@ -0,0 +1,1029 @@
+"""
+:code:`engine.py`
+=================
+
+headless fitting engine for pyGC. Holds the gaussian models, the least square
+regression and the peak area integration, with no kivy or matplotlib in
+sight - so fits can run in worker processes, benchmarks and batch scripts.
+GUI.functionalize() is a thin adapter around fit().
+
+"""
+
+from collections import namedtuple
+
+from numpy import (
+    asarray, float64, exp, sqrt, pi,
+    arange, zeros, concatenate,
+    empty, subtract, multiply,
+    square, negative, inf,
+    tile, clip, searchsorted,
+    full, cumsum, int64, ceil
+)
+
+from scipy.sparse import csc_matrix
+
+from pyGC.trace import grid_span
+
+from scipy.special import erf, ndtr, owens_t
+from scipy.optimize import leastsq, least_squares
+
+
+# step of the x grid the fitted curves are evaluated on for plotting/export,
+# and the points per sample that grid gets for evenly sampled data instead
+PLOT_STEP = 0.025
+PLOT_SAMPLES = 10
+
+# how far out, in widths, a peak still counts for the sparse solver - it is
+# down to exp(-REACH^2) of its height there
+REACH = 6.0
+
+
+class SymmetricGaussian(object):
+    """
+
+n-set of gaussians a * exp(-(x - b)^2 / c^2), with parameters
+[height, position, width] per peak.
+
+All peaks are evaluated at once as one (K peaks x N points) broadcast over
+the reshaped parameter vector, optionally into preallocated scratch buffers
+(see Workspace) so the solver's residual calls don't allocate per peak.
+    """
+
+    name = 'Symmetric Gaussian'
+
+    # parameters per peak, and the values appended to each [height, position]
+    # initial guess to complete it
+    size = 3
+    defaults = (1,)
+
+    # number of (K x N) scratch buffers peaks() and jacobian() work in
+    scratch = 1
+
+    @staticmethod
+    def peak(x, a, b, c):
+        return a * exp((-(x - b) ** 2.0) / c ** 2.0)
+
+    def split(self, p):
+        # one (K x 1) column per parameter, broadcasting against x
+        return asarray(p, dtype=float64).reshape(-1, self.size).T[:, :, None]
+
+    def peaks(self, x, p, out=None):
+        """
+
+every peak of the model evaluated on its own, in one broadcast.
+
+::
+
+        :param x:       (array)
+
+x values the model is evaluated at.
+
+::
+
+        :param p:       (array)
+
+flat parameter vector, peak after peak.
+
+::
+
+        :param out:     (list)
+
+scratch buffers of shape (K, len(x)) to work in, as made by Workspace. None
+allocates fresh ones.
+
+::
+
+        :return:        (array)
+
+(K, len(x)) array with one peak per row - a view of out[0] when given.
+        """
+        a, b, c = self.split(p)
+        y = subtract(x, b, out=None if out is None else out[0])
+        square(y, out=y)
+        y /= -c ** 2.0
+        exp(y, out=y)
+        y *= a
+        return y
+
+    def evaluate(self, x, p, out=None):
+        return self.peaks(x, p, out).sum(axis=0)
+
+    def jacobian(self, x, p, jac=None, out=None):
+        """
+
+closed-form derivatives of evaluate() with respect to every parameter, all
+peaks at once.
+
+::
+
+        :param x:       (array)
+
+x values the model is evaluated at.
+
+::
+
+        :param p:       (array)
+
+flat parameter vector, peak after peak.
+
+::
+
+        :param jac:     (array)
+
+(K, size, len(x)) buffer to write the derivatives into. None allocates one.
+
+::
+
+        :param out:     (list)
+
+scratch buffers of shape (K, len(x)), as for peaks().
+
+::
+
+        :return:        (array)
+
+len(p) by len(x) array of partial derivatives - one row per parameter, the
+layout leastsq takes with col_deriv.
+        """
+        a, b, c = self.split(p)
+        if jac is None:
+            jac = empty((a.shape[0], self.size, x.shape[0]), dtype=float64)
+        j_a, j_b, j_c = jac[:, 0], jac[:, 1], jac[:, 2]
+
+        # d/da = e = exp(-u^2 / c^2), with u = x - b
+        subtract(x, b, out=j_b)
+        square(j_b, out=j_a)
+        j_a /= -c ** 2.0
+        exp(j_a, out=j_a)
+
+        # d/dc = 2 a e u^2 / c^3
+        square(j_b, out=j_c)
+        j_c *= j_a
+        j_c *= 2.0 * a / c ** 3.0
+
+        # d/db = 2 a e u / c^2
+        j_b *= j_a
+        j_b *= 2.0 * a / c ** 2.0
+
+        return jac.reshape(-1, x.shape[0])
+
+    def areas(self, p, lo=-inf, hi=inf):
+        """
+
+exact integral of every peak between two bounds, all peaks in one call.
+
+::
+
+        :param p:       (array)
+
+flat parameter vector, peak after peak.
+
+::
+
+        :param lo:      (float)
+        :param hi:      (float)
+
+integration bounds - infinite by default.
+
+::
+
+        :return:        (array)
+
+one area per peak.
+        """
+        a, b, c = self.split(p)[:, :, 0]
+        c = abs(c)
+
+        # a * c * sqrt(pi) / 2 * [erf((x - b) / c)] between the bounds
+        return a * c * sqrt(pi) / 2.0 * (erf((hi - b) / c) - erf((lo - b) / c))
+
+
+    def extent(self, p):
+        """
+
+half-width around each peak's position beyond which it is negligible -
+exp(-REACH^2) of its height.
+
+::
+
+        :param p:       (array)
+
+flat parameter vector, peak after peak.
+
+::
+
+        :return:        (array)
+
+one half-width per peak.
+        """
+        return REACH * abs(asarray(p, dtype=float64)[2::self.size])
+
+    def bounds(self, x, peaks):
+        """
+
+parameter bounds for the bounded solvers - positive heights and widths, and
+positions inside the data range. Any further parameters (skew) are free.
+
+::
+
+        :param x:       (array)
+
+x data being fitted.
+
+::
+
+        :param peaks:   (int)
+
+number of peaks being fitted.
+
+::
+
+        :return:        (tuple)
+
+(lower, upper) flat arrays of bounds, peak after peak.
+        """
+        free = self.size - 3
+        lower = [0.0, x.min(), 0.0] + [-inf] * free
+        upper = [inf, x.max(), inf] + [inf] * free
+        return (
+            tile(asarray(lower, dtype=float64), peaks),
+            tile(asarray(upper, dtype=float64), peaks)
+        )
+
+
+class AsymmetricGaussian(SymmetricGaussian):
+    """
+
+n-set of skewed gaussians, with parameters [height, position, width, skew]
+per peak.
+    """
+
+    name = 'Asymmetric Gaussian'
+
+    size = 4
+    defaults = (1, 0)
+
+    scratch = 2
+
+    @staticmethod
+    def peak(x, a, b, c, d):
+        return (a / (c * sqrt(2 * pi))) * exp(
+            (-(x - b) ** 2.0) / 2 * c ** 2.0) * (
+            1 + erf((d * (x - b)) / (c * sqrt(2))))
+
+    def peaks(self, x, p, out=None):
+        a, b, c, d = self.split(p)
+        if out is None:
+            out = [None, None]
+
+        # skew term s = 1 + erf(d u / (c sqrt(2))), with u = x - b
+        u = subtract(x, b, out=out[0])
+        s = multiply(u, d / (c * sqrt(2)), out=out[1])
+        erf(s, out=s)
+        s += 1.0
+
+        # a / (c sqrt(2 pi)) * exp(-u^2 c^2 / 2) * s
+        y = square(u, out=u)
+        y *= -c ** 2.0 / 2.0
+        exp(y, out=y)
+        y *= s
+        y *= a / (c * sqrt(2 * pi))
+        return y
+
+    def jacobian(self, x, p, jac=None, out=None):
+        # peak() is written as a * n * g * s with n = 1 / (c sqrt(2 pi)),
+        # g = exp(-u^2 c^2 / 2), s = 1 + erf(z), z = d u / (c sqrt(2)) and
+        # u = x - b. ngds is a * n * g * erf'(z), shared by the b, c and d
+        # derivatives.
+        a, b, c, d = self.split(p)
+        if jac is None:
+            jac = empty((a.shape[0], self.size, x.shape[0]), dtype=float64)
+        t = empty(jac[:, 0].shape) if out is None else out[0]
+        j_a, j_b, j_c, j_d = jac[:, 0], jac[:, 1], jac[:, 2], jac[:, 3]
+        n = 1.0 / (c * sqrt(2 * pi))
+
+        # j_d = u, j_a = g
+        subtract(x, b, out=j_d)
+        square(j_d, out=j_a)
+        j_a *= -c ** 2.0 / 2.0
+        exp(j_a, out=j_a)
+
+        # j_b = ngds, j_c = s
+        multiply(j_d, d / (c * sqrt(2)), out=j_c)
+        square(j_c, out=j_b)
+        negative(j_b, out=j_b)
+        exp(j_b, out=j_b)
+        erf(j_c, out=j_c)
+        j_c += 1.0
+        j_b *= j_a
+        j_b *= a * n * 2.0 / sqrt(pi)
+
+        # d/da = n * g * s
+        j_a *= j_c
+        j_a *= n
+
+        # t = ngds * u
+        multiply(j_b, j_d, out=t)
+
+        # d/dc, first part: -a n g s (1 / c + u^2 c)
+        square(j_d, out=j_c)
+        j_c *= c
+        j_c += 1.0 / c
+        j_c *= j_a
+        j_c *= -a
+
+        # d/db = a n g s u c^2 - ngds d / (c sqrt(2))
+        j_b *= -d / (c * sqrt(2))
+        j_d *= j_a
+        j_d *= a * c ** 2.0
+        j_b += j_d
+
+        # d/dd = ngds u / (c sqrt(2))
+        multiply(t, 1.0 / (c * sqrt(2)), out=j_d)
+
+        # d/dc, second part: - ngds z / c = - (d/dd) * d / c
+        multiply(j_d, d / c, out=t)
+        j_c -= t
+
+        return jac.reshape(-1, x.shape[0])
+
+    def extent(self, p):
+        # width parameter is an inverse width here - exp(-u^2 c^2 / 2)
+        return REACH * sqrt(2) / abs(asarray(p, dtype=float64)[2::self.size])
+
+    def areas(self, p, lo=-inf, hi=inf):
+        # the peak is a skew-normal density in disguise - width 1 / |c| and
+        # shape d / (c |c|) - scaled by a / (c |c|). Its integral follows
+        # from the skew-normal cdf Phi(t) - 2 T(t, shape), T being Owen's T.
+        a, b, c, d = self.split(p)[:, :, 0]
+        shape = d / (c * abs(c))
+
+        def cdf(t):
+            return ndtr(t) - 2.0 * owens_t(t, shape)
+
+        return a / (c * abs(c)) * (
+            cdf((hi - b) * abs(c)) - cdf((lo - b) * abs(c))
+        )
+
+
+class Workspace(object):
+    """
+
+preallocated buffers for evaluating one model on a fixed x with a fixed
+number of peaks - made once per fit and reused on every solver iteration.
+    """
+
+    def __init__(self, model, x, peaks, x_grid=None):
+        # x_grid is only of use to SparseWorkspace
+        self.model = model
+        self.x = x
+        self.scratch = [
+            empty((peaks, x.shape[0]), dtype=float64)
+            for _ in range(model.scratch)
+        ]
+        self.jac = empty((peaks, model.size, x.shape[0]), dtype=float64)
+        self.total = empty(x.shape[0], dtype=float64)
+
+    def evaluate(self, p):
+        return self.model.peaks(self.x, p, self.scratch).sum(
+            axis=0, out=self.total
+        )
+
+    def jacobian(self, p):
+        return self.model.jacobian(self.x, p, self.jac, self.scratch)
+
+
+class SparseWorkspace(object):
+    """
+
+evaluates a model peak by peak over only the samples within each peak's
+reach (see extent()), and hands back its jacobian as a sparse matrix - so the
+cost of a solver iteration grows with peaks times their local window rather
+than peaks times the full length of the data. Windows follow the current
+positions and widths on every call. x must be in ascending order. Given the
+(x0, dx) x_grid of evenly sampled x, the windows come from index arithmetic
+instead of searching x.
+    """
+
+    def __init__(self, model, x, peaks, x_grid=None):
+        self.model = model
+        self.x = x
+        self.x_grid = x_grid
+        self.total = empty(x.shape[0], dtype=float64)
+
+    def windows(self, p):
+        # [lo, hi) index range of every peak's window
+        b = asarray(p, dtype=float64)[1::self.model.size]
+        half = self.model.extent(p)
+        if self.x_grid is not None:
+            return grid_span(self.x_grid, b - half, b + half, len(self.x))
+        return (
+            searchsorted(self.x, b - half),
+            searchsorted(self.x, b + half, side='right')
+        )
+
+    def evaluate(self, p):
+        size = self.model.size
+        self.total[:] = 0.0
+        for k, (lo, hi) in enumerate(zip(*self.windows(p))):
+            self.total[lo:hi] += self.model.peaks(
+                self.x[lo:hi], p[size * k:size * (k + 1)]
+            )[0]
+        return self.total
+
+    def jacobian(self, p):
+        """
+
+derivatives of evaluate() with respect to every parameter, as a sparse
+len(x) by len(p) matrix with entries only inside each peak's window.
+
+::
+
+        :param p:       (array)
+
+flat parameter vector, peak after peak.
+
+::
+
+        :return:        (csc_matrix)
+
+the jacobian - each parameter's column holds its peak's window.
+        """
+        size = self.model.size
+        rows, values, counts = [], [], []
+
+        for k, (lo, hi) in enumerate(zip(*self.windows(p))):
+            # (size, hi - lo) - row-major, so each parameter's entries
+            # are already one contiguous run of the csc data array
+            values.append(self.model.jacobian(
+                self.x[lo:hi], p[size * k:size * (k + 1)]
+            ).ravel())
+            rows.append(tile(arange(lo, hi), size))
+            counts.append(full(size, hi - lo))
+
+        indptr = zeros(len(p) + 1, dtype=int64)
+        cumsum(concatenate(counts), out=indptr[1:])
+
+        return csc_matrix(
+            (concatenate(values), concatenate(rows), indptr),
+            shape=(self.x.shape[0], len(p))
+        )
+
+
+MODELS = {
+    model.name: model() for model in (SymmetricGaussian, AsymmetricGaussian)
+}
+
+
+def get_model(model):
+    """
+
+looks up a fitting model.
+
+::
+
+    :param model:       (str); (model)
+
+name of the model - 'Symmetric Gaussian' or 'Asymmetric Gaussian', with or
+without the GUI's 'Function Type: ' prefix - or a model instance.
+
+::
+
+    :return:            (model)
+
+the model instance.
+    """
+    if not isinstance(model, str):
+        return model
+
+    name = model.replace('Function Type: ', '')
+    if name not in MODELS:
+        error_msg = 'Unknown model: ' + model
+        raise RuntimeError(error_msg)
+
+    return MODELS[name]
+
+
+class FitResult(namedtuple(
+        'FitResult', ['model', 'params', 'areas', 'x_range', 'nfev', 'ier'])):
+    """
+
+result of fit().
+
+- :code:`model`: name of the fitted model.
+- :code:`params`: flat array of the fitted parameters, peak after peak.
+- :code:`areas`: integral of each fitted peak over x_range, or over the
+  area_bounds given to fit().
+- :code:`x_range`: (first, last) x value of the fitted data.
+- :code:`nfev`: number of model evaluations the solver made.
+- :code:`ier`: solver status flag - 1 through 4 mean a solution was found.
+    """
+
+    __slots__ = ()
+
+    @property
+    def peaks(self):
+        # one row of parameters per peak
+        return self.params.reshape(-1, get_model(self.model).size)
+
+    def evaluate(self, x):
+        """
+
+the fitted n-set of peaks summed at x.
+
+::
+
+        :param x:       (array)
+
+x values to evaluate at.
+
+::
+
+        :return:        (array)
+
+resultant curve.
+        """
+        return get_model(self.model).evaluate(x, self.params)
+
+    def components(self, x):
+        """
+
+each fitted peak on its own at x.
+
+::
+
+        :param x:       (array)
+
+x values to evaluate at.
+
+::
+
+        :return:        (array)
+
+(K, len(x)) array with one peak per row.
+        """
+        return get_model(self.model).peaks(
+            asarray(x, dtype=float64), self.params
+        )
+
+    def integrate(self, lo=-inf, hi=inf):
+        """
+
+exact area of each fitted peak between two bounds.
+
+::
+
+        :param lo:      (float)
+        :param hi:      (float)
+
+integration bounds - infinite by default.
+
+::
+
+        :return:        (array)
+
+one area per peak.
+        """
+        return get_model(self.model).areas(self.params, lo, hi)
+
+    def plot_data(self, step=PLOT_STEP, dtype=float64, x_grid=None):
+        """
+
+evaluates the fit on an even grid over x_range, in the layout the GUI plots
+and exports.
+
+::
+
+        :param step:    (float)
+
+step of the x grid.
+
+::
+
+        :param dtype:   (type)
+
+dtype of the returned array. Curves are evaluated in float64 regardless.
+
+::
+
+        :param x_grid:  (tuple)
+
+(x0, dx) grid of evenly sampled data. When given, the curves are evaluated on
+that grid subdivided PLOT_SAMPLES times, in place of step.
+
+::
+
+        :return:        (array)
+
+array of columns [x, resultant, peak 1, peak 2, ...].
+        """
+        if x_grid is not None:
+            step = x_grid[1] / PLOT_SAMPLES
+
+        # whole steps from the first sample up to and past the last, as
+        # arange() would - with x_grid every sample lands on the plot grid
+        points = int(ceil(
+            (self.x_range[1] - self.x_range[0]) / step - 1e-9
+        )) + 1
+        grid = self.x_range[0] + step * arange(points, dtype=float64)
+
+        plot_data = zeros((len(grid), len(self.areas) + 2), dtype=dtype)
+        plot_data[:, 0] = grid
+        plot_data[:, 1] = self.evaluate(grid)
+
+        for i, curve in enumerate(self.components(grid)):
+            plot_data[:, i + 2] = curve
+
+        return plot_data
+
+
+def initial_params(initials, model):
+    """
+
+completes the [height, position] guesses clicked in the GUI with the model's
+default width (and skew) and flattens them into a parameter vector. Guesses
+which already carry a width (and skew) keep them.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists, one per peak.
+
+::
+
+    :param model:       (model)
+
+the model being fitted.
+
+::
+
+    :return:            (array)
+
+flat float64 vector of starting parameters.
+    """
+    return asarray(concatenate([
+        (list(guess) + list(model.defaults[max(len(guess) - 2, 0):]))
+        [:model.size]
+        for guess in initials
+    ]), dtype=float64)
+
+
+def solve_leastsq(workspace, y, p0):
+    """
+
+the original solver - MINPACK's leastsq on squared residuals.
+
+::
+
+    :param workspace:   (Workspace)
+
+buffers of the model being fitted, over the x data.
+
+::
+
+    :param y:           (array)
+
+y data being fitted.
+
+::
+
+    :param p0:          (array)
+
+starting parameters.
+
+::
+
+    :return:            (tuple)
+
+(params, nfev, ier) - fitted parameters, number of model evaluations and the
+solver's status flag.
+    """
+
+    def residuals(p):
+        return (y - workspace.evaluate(p)) ** 2
+
+    def jacobian(p):
+        # chain rule through the squared residual, in place in the
+        # workspace's jacobian buffer
+        jac = workspace.jacobian(p)
+        jac *= -2.0 * (y - workspace.evaluate(p))
+        return jac
+
+    lsq = leastsq(
+        residuals, p0, Dfun=jacobian, col_deriv=True, full_output=True
+    )
+    return lsq[0], lsq[2]['nfev'], lsq[4]
+
+
+def solve_trf(workspace, y, p0):
+    """
+
+bounded trust-region reflective solver on plain residuals y - f, with the
+bounds of the model's bounds() and jacobian-based parameter scaling. Converges
+in fewer, more predictable iterations than leastsq and can't wander off to
+negative heights or widths.
+
+::
+
+    :param workspace:   (Workspace)
+
+buffers of the model being fitted, over the x data.
+
+::
+
+    :param y:           (array)
+
+y data being fitted.
+
+::
+
+    :param p0:          (array)
+
+starting parameters - clipped into the bounds.
+
+::
+
+    :return:            (tuple)
+
+(params, nfev, status) - fitted parameters, number of model evaluations and
+the solver's status flag.
+    """
+    model = workspace.model
+    lower, upper = model.bounds(workspace.x, len(p0) // model.size)
+
+    def residuals(p):
+        return y - workspace.evaluate(p)
+
+    def jacobian(p):
+        # d(y - f)/dp, one column per parameter
+        jac = workspace.jacobian(p)
+        negative(jac, out=jac)
+        return jac.T
+
+    sol = least_squares(
+        residuals, clip(p0, lower, upper), jac=jacobian,
+        bounds=(lower, upper), method='trf', x_scale='jac'
+    )
+    return sol.x, sol.nfev, sol.status
+
+
+def solve_sparse(workspace, y, p0):
+    """
+
+solve_trf() for chromatograms with many peaks - the jacobian comes from a
+SparseWorkspace as a sparse matrix holding only each peak's local window,
+and the trust-region subproblems are solved iteratively with lsmr instead of
+by factoring a dense len(x) by len(p) matrix.
+
+::
+
+    :param workspace:   (SparseWorkspace)
+
+the model being fitted, over the x data.
+
+::
+
+    :param y:           (array)
+
+y data being fitted.
+
+::
+
+    :param p0:          (array)
+
+starting parameters - clipped into the bounds.
+
+::
+
+    :return:            (tuple)
+
+(params, nfev, status) - fitted parameters, number of model evaluations and
+the solver's status flag.
+    """
+    model = workspace.model
+    lower, upper = model.bounds(workspace.x, len(p0) // model.size)
+
+    def residuals(p):
+        return y - workspace.evaluate(p)
+
+    def jacobian(p):
+        return -workspace.jacobian(p)
+
+    sol = least_squares(
+        residuals, clip(p0, lower, upper), jac=jacobian,
+        bounds=(lower, upper), method='trf', tr_solver='lsmr',
+        x_scale='jac'
+    )
+    return sol.x, sol.nfev, sol.status
+
+
+# solver name -> (solver function, workspace it runs on)
+SOLVERS = {
+    'leastsq': (solve_leastsq, Workspace),
+    'trf': (solve_trf, Workspace),
+    'sparse': (solve_sparse, SparseWorkspace),
+}
+
+
+def fit(x, y, initials, model='Symmetric Gaussian', area_bounds=None,
+        solver='leastsq', x_grid=None):
+    """
+
+fits an n-set of gaussians to GC data by least square regression and
+integrates each fitted peak.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position] lists - one per gaussian to fit. Entries may also
+carry a starting width (and skew), see initial_params().
+
+::
+
+    :param model:       (str)
+                        ('Symmetric Gaussian'); 'Asymmetric Gaussian'
+
+model to fit, see get_model().
+
+::
+
+    :param area_bounds: (tuple)
+
+(lo, hi) bounds the peak areas are integrated between. Defaults to the range
+of x; (-inf, inf) gives the total area of each peak.
+
+::
+
+    :param solver:      (str)
+                        ('leastsq'); 'trf'; 'sparse'
+
+solver to fit with - see solve_leastsq(), solve_trf() and solve_sparse().
+'sparse' needs x in ascending order.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of x if it is evenly sampled in ascending order, see
+trace.data_grid(). The sparse solver then finds its windows by index
+arithmetic.
+
+::
+
+    :return:            (FitResult)
+
+fitted parameters, peak areas and solver information.
+    """
+    model = get_model(model)
+    x = asarray(x, dtype=float64)
+    y = asarray(y, dtype=float64)
+
+    if solver not in SOLVERS:
+        error_msg = 'Unknown solver: ' + str(solver)
+        raise RuntimeError(error_msg)
+
+    solve, workspace_type = SOLVERS[solver]
+    params, nfev, ier = solve(
+        workspace_type(model, x, len(initials), x_grid), y,
+        initial_params(initials, model)
+    )
+
+    if area_bounds is None:
+        area_bounds = (x[0], x[-1])
+
+    areas = model.areas(params, *area_bounds)
+
+    return FitResult(
+        model.name, params, areas, (float(x[0]), float(x[-1])), nfev, ier
+    )
+
+
+def refit(previous, x, y, add=(), remove=(), area_bounds=None,
+          solver='leastsq', x_grid=None):
+    """
+
+refits a converged fit after peaks are added or removed. Only the added peaks
+and the peaks overlapping an added or removed one are re-optimized, on the
+stretch of data they cover - every other peak keeps its converged parameters
+and is subtracted from the data as a fixed background.
+
+::
+
+    :param previous:    (FitResult)
+
+converged fit of the same x and y data.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram.
+
+::
+
+    :param add:         (list)
+
+a list of [height, position, ...] lists - the peaks to add, see
+initial_params().
+
+::
+
+    :param remove:      (list)
+
+indices of the previous fit's peaks to remove.
+
+::
+
+    :param area_bounds: (tuple)
+
+(lo, hi) bounds the peak areas are integrated between, see fit().
+
+::
+
+    :param solver:      (str)
+
+solver the affected peaks are refitted with, see fit().
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of x if it is evenly sampled in ascending order, see fit(). The
+refitted window is then cut out by index arithmetic.
+
+::
+
+    :return:            (FitResult)
+
+the remaining peaks in their previous order followed by the added peaks. nfev
+counts the refit only.
+    """
+    model = get_model(previous.model)
+    x = asarray(x, dtype=float64)
+    y = asarray(y, dtype=float64)
+
+    remove = sorted(set(remove))
+    keep = [i for i in range(len(previous.areas)) if i not in remove]
+
+    added = (
+        initial_params(add, model) if len(add) else empty(0, dtype=float64)
+    ).reshape(-1, model.size)
+    peaks = concatenate((previous.peaks[keep], added))
+    changed = concatenate((previous.peaks[remove], added))
+
+    # a peak is refitted if its reach overlaps that of a changed peak - the
+    # added peaks overlap themselves
+    centre, half = peaks[:, 1], model.extent(peaks.ravel())
+    free = (
+        abs(centre[:, None] - changed[None, :, 1])
+        <= half[:, None] + model.extent(changed.ravel())[None, :]
+    ).any(axis=1)
+
+    nfev, ier = 0, previous.ier
+
+    if free.any():
+        lo = (centre - half)[free].min()
+        hi = (centre + half)[free].max()
+
+        window_grid = None
+        if x_grid is not None:
+            start, stop = grid_span(x_grid, lo, hi, x.shape[0])
+            window = slice(start, stop)
+            window_grid = (x_grid[0] + start * x_grid[1], x_grid[1])
+        else:
+            window = (x >= lo) & (x <= hi)
+
+        # fixed peaks reaching into the window are subtracted from the data
+        near = ~free & (centre - half <= hi) & (centre + half >= lo)
+        y_window = y[window]
+        if near.any():
+            y_window = y_window - model.evaluate(
+                x[window], peaks[near].ravel()
+            )
+
+        result = fit(
+            x[window], y_window, peaks[free].tolist(), model.name,
+            solver=solver, x_grid=window_grid
+        )
+        peaks[free] = result.peaks
+        nfev, ier = result.nfev, result.ier
+
+    if area_bounds is None:
+        area_bounds = (x[0], x[-1])
+
+    params = peaks.ravel()
+    areas = model.areas(params, *area_bounds)
+
+    return FitResult(
+        model.name, params, areas, (float(x[0]), float(x[-1])), nfev, ier
+    )
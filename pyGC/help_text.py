@@ -32,7 +32,11 @@ requested text associated with the arg.
         columns derived from experiment. Text above and below the data will 
         be automatically filtered out by the program. There is no restriction 
         on the number of rows utilized for calculation. Locate the file using 
-        the built-in file explorer and click 'select'. 
+        the built-in file explorer and click 'select'. Files converted with 
+        the pyGC-convert command (.npy) load almost instantly, as do ANDI/AIA 
+        netCDF (.cdf) exports. Files with more than one detector column keep 
+        every column, and the 'Detector Channel' selector switches which one 
+        is plotted and fit without importing the file again. 
        '''
 
     elif arg == 'IV':
@@ -46,7 +50,8 @@ requested text associated with the arg.
         as your guess is made more accurate. Should you wish to delete any 
         points, the button 'clear last object' will remove the most recently 
         placed point from the graph. If you wish to start over, you can clear 
-        the graph entirely by selecting 'clear graph'.
+        the graph entirely by selecting 'clear graph'. Pressing 'find peaks' 
+        places a point on every peak the program detects by itself. 
         '''
 
     elif arg == 'OG':
@@ -0,0 +1,627 @@
+"""
+:code:`ingest.py`
+=================
+
+data ingestion for pyGC - turns the files users point the file_popup at into
+clean numpy arrays of GC data. Kept apart from GUI so the readers can be used
+(and converted from) without spinning up the kivy application.
+
+"""
+
+from numpy import (
+    float64, isnan, ascontiguousarray,
+    asfortranarray, load, save,
+    concatenate, empty, ceil,
+    arange
+)
+
+from pandas import(
+    read_csv, DataFrame,
+    to_numeric
+)
+
+from pandas.api.types import is_numeric_dtype
+
+from os.path import splitext, getsize
+
+from sys import argv
+
+from re import compile as re_compile
+
+from scipy.io import netcdf_file
+
+from openpyxl import load_workbook
+
+
+class ImportCancelled(RuntimeError):
+    """
+
+raised from a progress callback to stop an import part way through.
+    """
+
+
+def calc_primer(dataFile, chunksize=None, max_points=None, progress=None):
+    """
+
+refactors the given user data from the file_popup into an array of GC data.
+
+::
+
+    :param dataFile:    (str)
+
+GC data of Nx2 dimensions. Given as a string equivalent to the directory and
+file name of either a .csv or .xlsx of Nx2 dimensions. Text above and below
+data array will be automatically avoided by the program. A .npy file written
+by convert() is memory-mapped as-is, without any parsing or copying, and an
+ANDI/AIA .cdf export is read through read_andi().
+
+::
+
+    :param chunksize:   (int)
+
+when given, a .csv is streamed in chunks of this many rows through
+stream_csv() instead of being parsed in one go.
+
+::
+
+    :param max_points:  (int)
+
+when given, a .csv is streamed and decimated on the fly to about this many
+rows.
+
+::
+
+    :param progress:    (callable)
+
+when given, called as progress(bytes_read, total_bytes, rows) while a .csv or
+.xlsx is read - a .csv is streamed so there is something to report. Raising
+ImportCancelled from it stops the import.
+
+::
+
+    :return:            (array)
+
+refactored data set of Nx2 dimensionality in numpy array
+    """
+
+    if dataFile is None:
+        error_msg = 'Data must be passed as an array which is mappable ' \
+                   'to an Nx5 numpy array with columns ' \
+                   '[freq, e1, e2, mu1, mu2]'
+        raise RuntimeError(error_msg)
+
+    # allows for file location to be passed as the data variable.
+    elif isinstance(dataFile, str) is True:
+
+        if splitext(dataFile)[1] == '.csv' \
+                and (chunksize is not None or max_points is not None
+                     or progress is not None):
+            return stream_csv(
+                dataFile, chunksize=chunksize or 100000,
+                max_points=max_points, progress=progress
+            )
+
+        elif splitext(dataFile)[1] == '.csv':
+            sniff = sniff_csv(dataFile)
+            data = read_csv(
+                dataFile, sep=sniff['sep'], decimal=sniff['decimal'],
+                skiprows=sniff['skiprows'], usecols=range(sniff['ncols']),
+                header=None, skip_blank_lines=False, on_bad_lines='skip'
+            )
+            return numeric_block(data, decimal=sniff['decimal'])
+
+        elif splitext(dataFile)[1] == '.xlsx':
+            return stream_xlsx(dataFile, progress=progress)
+
+        elif splitext(dataFile)[1] == '.npy':
+            return load_binary(dataFile)
+
+        elif splitext(dataFile)[1] == '.cdf':
+            return read_andi(dataFile)
+
+        else:
+            error_msg = 'Error partitioning input data from string'
+            raise RuntimeError(error_msg)
+
+    else:
+        data = DataFrame(dataFile)
+
+    return numeric_block(data)
+
+
+# delimiter/decimal pairs the sniffer tries, in order of preference
+SNIFF_DIALECTS = (
+    (',', '.'), ('\t', '.'), ('\t', ','), (';', '.'), (';', ',')
+)
+
+NUMBER = re_compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+# consecutive numeric rows of equal width which mark the start of the data
+# block - a single numeric-looking header line (a date, say) doesn't count
+SNIFF_RUN = 5
+
+
+def sniff_csv(dataFile, head_bytes=65536):
+    """
+
+reads a small block from the head of a .csv file once and works out how the
+file is laid out, so the full parse only has to happen a single time.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the .csv to sniff.
+
+::
+
+    :param head_bytes:  (int)
+
+number of bytes read from the head of the file.
+
+::
+
+    :return:            (dict)
+
+keyword arguments for the single read_csv pass - the delimiter 'sep', the
+'decimal' character, the number of text lines 'skiprows' above the numeric
+block and the number of columns 'ncols' of the numeric block - along with the
+average 'line_bytes' of the head block, for estimating the row count. The
+numeric block is the first run of SNIFF_RUN numeric rows of equal width, or
+the longest run a file too short for that has. Raises RuntimeError if the head
+block has no numeric block.
+    """
+
+    with open(dataFile, 'rb') as f:
+        head = f.read(head_bytes)
+
+    lines = head.decode('utf-8', errors='replace').lstrip('\ufeff')
+    lines = lines.split('\n')
+
+    # the last line is likely cut short unless the whole file was read
+    if len(head) == head_bytes and len(lines) > 1:
+        del lines[-1]
+
+    complete = len(head) < head_bytes
+    best = None
+    best_rank = None
+    line_bytes = len(head) / max(len(lines), 1)
+
+    for sep, decimal in SNIFF_DIALECTS:
+        found = None
+        longest = (0, 0, 0)
+        start, length, width = 0, 0, 0
+
+        for row, line in enumerate(lines):
+            fields = [
+                field.strip().strip('"').replace(decimal, '.')
+                if decimal != '.' else field.strip().strip('"')
+                for field in line.rstrip('\r').split(sep)
+            ]
+
+            if len(fields) < 2 \
+                    or not all(NUMBER.match(field) for field in fields):
+                length = 0
+                continue
+
+            if length and len(fields) == width:
+                length += 1
+            else:
+                start, length, width = row, 1, len(fields)
+
+            if length > longest[0]:
+                longest = (length, start, width)
+
+            if length == SNIFF_RUN:
+                found = (start, width)
+                break
+
+        # a file shorter than a full run still has its data block - the
+        # longest run it holds
+        if found is None and complete and longest[0]:
+            found = longest[1:]
+
+        if found is None:
+            continue
+
+        # earliest numeric block wins, then the widest one
+        rank = (found[0], -found[1])
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            best = {
+                'sep': sep, 'decimal': decimal,
+                'skiprows': found[0], 'ncols': found[1]
+            }
+
+    if best is None:
+        error_msg = 'No block of numeric data found at the head of ' \
+                    + str(dataFile)
+        raise RuntimeError(error_msg)
+
+    best['line_bytes'] = line_bytes
+    return best
+
+
+def stream_csv(dataFile, chunksize=100000, max_points=None, progress=None):
+    """
+
+reads a .csv GC data file in chunks of rows, so files far larger than memory
+can be loaded. Each chunk is stripped of its non-numeric rows on its own and,
+when max_points is given, decimated before the next chunk is read.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the .csv to read.
+
+::
+
+    :param chunksize:   (int)
+
+number of rows parsed per chunk.
+
+::
+
+    :param max_points:  (int)
+
+target number of rows of the returned array. Every n-th row is kept, with n
+estimated from the file size up front. None keeps every row.
+
+::
+
+    :param progress:    (callable)
+
+called as progress(bytes_read, total_bytes, rows) after every chunk.
+
+::
+
+    :return:            (array)
+
+contiguous float64 array of the numeric block of the file.
+    """
+
+    sniff = sniff_csv(dataFile)
+
+    stride = 1
+    if max_points is not None:
+        rows = getsize(dataFile) / sniff['line_bytes'] - sniff['skiprows']
+        stride = max(1, int(ceil(rows / max_points)))
+
+    blocks = []
+    seen = 0
+    total = getsize(dataFile)
+
+    # parse from an open handle so its position tells how far along we are.
+    # names rather than usecols - a chunk of nothing but short footer rows
+    # would be out of bounds for usecols, with names they pad out with NaN
+    with open(dataFile, 'rb') as handle, read_csv(
+            handle, sep=sniff['sep'], decimal=sniff['decimal'],
+            skiprows=sniff['skiprows'], names=range(sniff['ncols']),
+            index_col=False, header=None, skip_blank_lines=False,
+            on_bad_lines='skip', chunksize=chunksize
+    ) as reader:
+        for chunk in reader:
+            block = numeric_block(chunk, decimal=sniff['decimal'])
+
+            # keep the rows whose index in the whole numeric block is a
+            # multiple of stride, so decimation doesn't drift across chunks
+            blocks.append(block[(-seen) % stride::stride].copy())
+            seen += block.shape[0]
+
+            if progress is not None:
+                progress(min(handle.tell(), total), total, seen)
+
+    if not blocks:
+        return empty((0, sniff['ncols']))
+
+    data = concatenate(blocks)
+
+    # the row estimate is only as good as the head block was typical
+    if max_points is not None and data.shape[0] > max_points:
+        data = data[::int(ceil(data.shape[0] / max_points))]
+
+    return ascontiguousarray(data)
+
+
+def numeric_block(frame, decimal='.'):
+    """
+
+strips the text above and below the data array of a parsed GC file, column by
+column instead of cell by cell.
+
+::
+
+    :param frame:       (DataFrame)
+
+raw contents of the data file as read by pandas, text cells and all.
+
+::
+
+    :param decimal:     (str)
+
+decimal character of the numbers in the file. Columns which pandas left as
+text because of a stray text row are converted using it.
+
+::
+
+    :return:            (array)
+
+contiguous float64 array holding only the rows in which every column is a
+number.
+    """
+
+    if decimal != '.':
+        frame = frame.apply(
+            lambda col: col if is_numeric_dtype(col)
+            else col.str.replace(decimal, '.', regex=False)
+        )
+
+    # coerce whole columns at once - anything which can't be a number
+    # becomes NaN, which then flags its row as a non-data row.
+    values = frame.apply(to_numeric, errors='coerce').to_numpy(
+        dtype=float64, na_value=float64('nan')
+    )
+    values = values[~isnan(values).any(axis=1)]
+
+    return ascontiguousarray(values)
+
+
+# rows read between progress reports from stream_xlsx()
+XLSX_PROGRESS_ROWS = 10000
+
+
+def stream_xlsx(dataFile, progress=None):
+    """
+
+reads the first sheet of a .xlsx GC data file row by row in openpyxl's
+read-only mode. The numeric block is found as in sniff_csv() - the first run
+of SNIFF_RUN fully numeric rows spanning the same columns, or the longest run
+of a sheet too short for that. From there on only the columns it spans are
+read, straight into a preallocated float64 array - no DataFrame and no object
+array is ever built.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the .xlsx to read.
+
+::
+
+    :param progress:    (callable)
+
+called as progress(bytes_read, total_bytes, rows) every XLSX_PROGRESS_ROWS
+rows. The workbook is compressed, so bytes_read is estimated from the share of
+the sheet's rows read so far.
+
+::
+
+    :return:            (array)
+
+contiguous float64 array of the numeric block of the sheet.
+    """
+
+    workbook = load_workbook(dataFile, read_only=True, data_only=True)
+
+    try:
+        sheet = workbook.worksheets[0]
+
+        # find the first row of the numeric block and the columns it spans
+        found = None
+        longest = (0, None)
+        run, length = None, 0
+
+        for row, values in enumerate(sheet.iter_rows(values_only=True), 1):
+            cols = [
+                col for col, value in enumerate(values, 1)
+                if value is not None
+            ]
+            if len(cols) < 2 or not all(
+                    cell_number(values[col - 1]) is not None for col in cols
+            ):
+                length = 0
+                continue
+
+            if length and (cols[0], cols[-1]) == run[1:]:
+                length += 1
+            else:
+                run, length = (row, cols[0], cols[-1]), 1
+
+            if length > longest[0]:
+                longest = (length, run)
+
+            if length == SNIFF_RUN:
+                found = run
+                break
+
+        # a sheet shorter than a full run still has its data block - the
+        # longest run it holds
+        if found is None:
+            found = longest[1]
+
+        if found is None:
+            return empty((0, 2))
+
+        start, min_col, max_col = found
+
+        # sheet dimensions are usually recorded, so the array can be sized
+        # once - grow by doubling for files which don't record them
+        size = (sheet.max_row or start) - start + 1
+        total = getsize(dataFile)
+        data = empty((max(size, 1), max_col - min_col + 1), dtype=float64)
+        n = 0
+
+        for values in sheet.iter_rows(
+                min_row=start, min_col=min_col, max_col=max_col,
+                values_only=True
+        ):
+            numbers = [cell_number(value) for value in values]
+            if None in numbers:
+                continue
+
+            if n == data.shape[0]:
+                data = resize_rows(data, 2 * n)
+            data[n] = numbers
+            n += 1
+
+            if progress is not None and n % XLSX_PROGRESS_ROWS == 0:
+                progress(min(int(total * n / size), total), total, n)
+
+    finally:
+        workbook.close()
+
+    if progress is not None:
+        progress(total, total, n)
+
+    return ascontiguousarray(data[:n])
+
+
+def cell_number(value):
+    # numeric value of a spreadsheet cell, or None if it isn't a number
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def resize_rows(data, rows):
+    # copy of data with room for the given number of rows
+    grown = empty((rows, data.shape[1]), dtype=data.dtype)
+    grown[:data.shape[0]] = data
+    return grown
+
+
+def read_andi(dataFile):
+    """
+
+reads an ANDI/AIA chromatography netCDF export. The detector signal is taken
+from the memory-mapped 'ordinate_values' variable and the time axis is
+rebuilt from the sampling interval, so no text is parsed at all.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the .cdf file.
+
+::
+
+    :return:            (array)
+
+Nx2 float64 data array of [time, signal], with time in the units of the file
+(seconds, per the ANDI specification).
+    """
+
+    with netcdf_file(dataFile, 'r', mmap=True) as cdf:
+
+        if 'ordinate_values' not in cdf.variables:
+            error_msg = 'No ordinate_values found in ANDI file'
+            raise RuntimeError(error_msg)
+
+        interval = andi_scalar(cdf, 'actual_sampling_interval', 1.0)
+        delay = andi_scalar(cdf, 'actual_delay_time', 0.0)
+        length = cdf.variables['ordinate_values'].shape[0]
+
+        data = empty((length, 2), dtype=float64)
+        data[:, 0] = arange(length, dtype=float64)
+        data[:, 0] *= interval
+        data[:, 0] += delay
+
+        # the only pass over the mapped signal - it has to be copied out
+        # before the file is closed anyway
+        data[:, 1] = cdf.variables['ordinate_values'][:]
+
+    return data
+
+
+def andi_scalar(cdf, name, default):
+    # scalar ANDI variables are optional - fall back to a default if absent
+    if name not in cdf.variables:
+        return default
+    return float(cdf.variables[name].getValue())
+
+
+def load_binary(binFile):
+    """
+
+opens a pyGC binary chromatogram with numpy.memmap - nothing is read from disk
+until the columns are actually used.
+
+::
+
+    :param binFile:     (str)
+
+directory and file name of a .npy file written by convert().
+
+::
+
+    :return:            (memmap)
+
+read-only Nx2 (or wider) float64 data array backed by the file.
+    """
+
+    data = load(binFile, mmap_mode='r')
+
+    if data.ndim != 2 or data.dtype != float64:
+        error_msg = 'Binary data must be a 2-dimensional float64 array ' \
+                    'as written by pyGC.ingest.convert()'
+        raise RuntimeError(error_msg)
+
+    return data
+
+
+def convert(dataFile, binFile=None):
+    """
+
+parses a .csv or .xlsx GC data file once through calc_primer() and writes the
+cleaned array out in pyGC's binary format, so later imports are near-instant.
+
+::
+
+    :param dataFile:    (str)
+
+directory and file name of the .csv or .xlsx to convert.
+
+::
+
+    :param binFile:     (str)
+
+directory and file name of the .npy to write. Defaults to the data file with
+its extension swapped for .npy.
+
+::
+
+    :return:            (str)
+
+directory and file name of the written .npy file.
+    """
+
+    if binFile is None:
+        binFile = splitext(dataFile)[0] + '.npy'
+
+    # column-major, so each of the x and y columns is one contiguous run
+    # of raw float64 values in the file.
+    save(binFile, asfortranarray(calc_primer(dataFile), dtype=float64))
+
+    return binFile
+
+
+def convert_files():
+    """
+
+console entry point for pyGC-convert - converts every data file given on the
+command line to pyGC's binary format.
+
+::
+
+    :return:        none
+    """
+    for dataFile in argv[1:]:
+        print(convert(dataFile))
@@ -120,6 +120,27 @@ KVlang = '''
 <file_popup>:
     title: 'File Directory'
 
+<import_popup>:
+    title: 'Importing'
+    size_hint: 0.6, 0.3
+    auto_dismiss: False
+    BoxLayout:
+        orientation: 'vertical'
+        spacing: 10
+        padding: 10
+        ProgressBar:
+            id: bar
+            max: 100
+            value: 0
+        Label:
+            id: status
+            text: ''
+        Button:
+            id: cancel
+            text: 'Cancel'
+            background_color: (1,0,0,1)
+            on_release: root.cancel()
+
 <help_popup>:
     id: help_popup
     title: 'Help Menu'
@@ -202,6 +223,14 @@ KVlang = '''
                 text: 'Function Type: Symmetric Gaussian'
                 values: ['Function Type: Symmetric Gaussian', 'Function Type: Asymmetric Gaussian']
 
+            Spinner:
+                id: channel
+                size_hint_x: 0.5
+                text: 'Detector Channel: 1'
+                values: ['Detector Channel: 1']
+                on_press: self.values = root.channel_values()
+                on_text: root.select_channel(self.text)
+
         BoxLayout:
             Button:
                 text: 'Reset'
@@ -0,0 +1,297 @@
+"""
+:code:`multistart.py`
+=====================
+
+multi-start global search for badly overlapped peaks. A least square fit only
+finds the local minimum nearest its starting point, so co-eluting peaks can
+land in a different minimum depending on where they were clicked. Here the
+initial guesses are jittered into a set of starting points which are fitted
+concurrently across cores; the best fit is kept and the scatter of the other
+candidates shows how well determined it is.
+
+"""
+
+from collections import namedtuple
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from numpy import asarray, float64, exp, argsort, isfinite, inf, square
+
+from numpy.random import default_rng
+
+from pyGC.engine import fit, get_model, initial_params, REACH
+
+
+# default number of starting points, and how many candidates have to land on
+# the best fit before the rest are called off
+STARTS = 16
+AGREE = 3
+
+# relative difference in residual sum of squares within which two candidates
+# count as the same minimum
+COST_TOLERANCE = 1e-4
+
+# standard deviations of the jitter - positions in peak widths, widths as a
+# log-normal factor, skews additive
+POSITION_JITTER = 0.5
+WIDTH_JITTER = 0.3
+SKEW_JITTER = 1.0
+
+
+class MultiStartResult(namedtuple(
+        'MultiStartResult', ['best', 'costs', 'params', 'areas'])):
+    """
+
+result of fit_multistart().
+
+- :code:`best`: FitResult of the candidate with the lowest residual.
+- :code:`costs`: residual sum of squares of every finished candidate, in
+  ascending order.
+- :code:`params`: (candidates, P) array of the candidates' fitted parameters,
+  in the order of costs.
+- :code:`areas`: (candidates, K) array of the candidates' peak areas, in the
+  order of costs.
+
+The spreads are taken over the candidates which landed on the best minimum -
+within COST_TOLERANCE of the best cost - so candidates stuck in other minima
+don't inflate them. How many other minima there were is counted by minima.
+    """
+
+    __slots__ = ()
+
+    @property
+    def settled(self):
+        # mask of the candidates on the best minimum
+        return self.costs <= self.costs[0] * (1 + COST_TOLERANCE)
+
+    @property
+    def spread(self):
+        # standard deviation of each fitted parameter across the candidates on
+        # the best minimum, one row per peak
+        return self.params[self.settled].std(axis=0).reshape(
+            self.best.peaks.shape
+        )
+
+    @property
+    def area_spread(self):
+        # standard deviation of each peak area across the candidates on the
+        # best minimum
+        return self.areas[self.settled].std(axis=0)
+
+    @property
+    def minima(self):
+        # number of distinct minima the finished candidates landed in - costs
+        # more than COST_TOLERANCE apart count as different minima
+        costs = self.costs[isfinite(self.costs)]
+        if costs.shape[0] == 0:
+            return 0
+        return 1 + int(
+            (costs[1:] > costs[:-1] * (1 + COST_TOLERANCE)).sum()
+        )
+
+
+def jitter_starts(initials, model, starts=STARTS, seed=None):
+    """
+
+jittered starting points around a set of initial guesses.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists, see engine.initial_params().
+
+::
+
+    :param model:       (str)
+
+model the starting points are for, see engine.get_model().
+
+::
+
+    :param starts:      (int)
+
+number of starting points. The first is the initials themselves.
+
+::
+
+    :param seed:        (int)
+
+seed of the random jitter, for reproducible searches.
+
+::
+
+    :return:            (list)
+
+starts lists of [height, position, width(, skew)] lists, ready for fit().
+    """
+    model = get_model(model)
+    p0 = initial_params(initials, model).reshape(-1, model.size)
+    scale = model.extent(p0.ravel()) / REACH
+
+    rng = default_rng(seed)
+    points = [p0.tolist()]
+
+    for _ in range(starts - 1):
+        p = p0.copy()
+        p[:, 1] += rng.normal(0.0, POSITION_JITTER, len(p)) * scale
+        p[:, 2] *= exp(rng.normal(0.0, WIDTH_JITTER, len(p)))
+        if model.size > 3:
+            p[:, 3] += rng.normal(0.0, SKEW_JITTER, len(p))
+        points.append(p.tolist())
+
+    return points
+
+
+def fit_start(x, y, guesses, model, solver, x_grid=None):
+    """
+
+fits one starting point and scores it - the unit of work of
+fit_multistart().
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+    :param guesses:     (list)
+    :param model:       (str)
+    :param solver:      (str)
+    :param x_grid:      (tuple)
+
+passed on to engine.fit().
+
+::
+
+    :return:            (tuple)
+
+(FitResult, residual sum of squares). A fit which fails outright scores inf.
+    """
+    try:
+        result = fit(x, y, guesses, model, solver=solver, x_grid=x_grid)
+    except (ValueError, RuntimeError):
+        return None, inf
+
+    cost = float(square(y - result.evaluate(x)).sum())
+    return result, cost if isfinite(cost) else inf
+
+
+def fit_multistart(x, y, initials, model='Symmetric Gaussian',
+                   solver='leastsq', starts=STARTS, workers=None,
+                   agree=AGREE, seed=None, x_grid=None):
+    """
+
+fits jittered copies of the initial guesses concurrently and keeps the best.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists, one per peak.
+
+::
+
+    :param model:       (str)
+
+model to fit, see engine.get_model().
+
+::
+
+    :param solver:      (str)
+
+least square solver, see engine.fit().
+
+::
+
+    :param starts:      (int)
+
+number of starting points, see jitter_starts().
+
+::
+
+    :param workers:     (int)
+
+number of worker processes. None uses one per core, 1 fits the starting points
+one after the other in this process.
+
+::
+
+    :param agree:       (int)
+
+stops early, calling off the starting points not yet begun, once this many
+candidates have landed on the best fit so far. None fits every one.
+
+::
+
+    :param seed:        (int)
+
+seed of the random jitter.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of x if it is evenly sampled, see engine.fit().
+
+::
+
+    :return:            (MultiStartResult)
+
+the best fit and the candidates it was chosen from.
+    """
+    model = get_model(model).name
+    x = asarray(x, dtype=float64)
+    y = asarray(y, dtype=float64)
+
+    points = jitter_starts(initials, model, starts, seed)
+    finished = []
+
+    def settled():
+        # number of candidates on the best minimum found so far
+        best = min(cost for _, cost in finished)
+        if not isfinite(best):
+            return 0
+        return sum(
+            cost <= best * (1 + COST_TOLERANCE) for _, cost in finished
+        )
+
+    if workers == 1:
+        for guesses in points:
+            finished.append(
+                fit_start(x, y, guesses, model, solver, x_grid)
+            )
+            if agree and settled() >= agree:
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [
+                pool.submit(fit_start, x, y, guesses, model, solver, x_grid)
+                for guesses in points
+            ]
+            for job in as_completed(jobs):
+                finished.append(job.result())
+                if agree and settled() >= agree:
+                    for pending in jobs:
+                        pending.cancel()
+                    break
+
+    finished = [(result, cost) for result, cost in finished if result]
+    if not finished:
+        error_msg = 'No starting point could be fitted'
+        raise RuntimeError(error_msg)
+
+    order = argsort([cost for _, cost in finished])
+    finished = [finished[i] for i in order]
+
+    return MultiStartResult(
+        finished[0][0],
+        asarray([cost for _, cost in finished], dtype=float64),
+        asarray([result.params for result, _ in finished], dtype=float64),
+        asarray([result.areas for result, _ in finished], dtype=float64)
+    )
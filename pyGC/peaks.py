@@ -0,0 +1,134 @@
+"""
+:code:`peaks.py`
+================
+
+automatic peak detection - finds the peaks of a chromatogram and turns them
+into the initial guesses fit() starts from, so a fit can be seeded without
+anyone clicking on the graph (batch runs, unattended processing, or just a
+head start in the GUI).
+
+"""
+
+from numpy import asarray, float64, arange, interp, sqrt, log, pi
+
+from scipy.signal import find_peaks, savgol_filter
+
+from pyGC.engine import get_model
+
+
+# default smoothing window, in samples, and the smallest prominence a peak
+# needs as a fraction of the signal's range
+SMOOTH_WINDOW = 11
+MIN_PROMINENCE = 0.05
+
+
+def find_initials(x, y, prominence=MIN_PROMINENCE, smooth=SMOOTH_WINDOW,
+                  min_width=1, widths=False, model='Symmetric Gaussian',
+                  x_grid=None):
+    """
+
+detects the peaks of a chromatogram and returns initial guesses for them.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the chromatogram, x in ascending order.
+
+::
+
+    :param prominence:  (float)
+
+smallest prominence a peak needs, as a fraction of the range of the smoothed
+signal.
+
+::
+
+    :param smooth:      (int)
+
+window length, in samples, of the Savitzky-Golay filter run over y before
+peaks are searched for. 0 or None skips smoothing.
+
+::
+
+    :param min_width:   (float)
+
+smallest half-height width a peak needs, in samples.
+
+::
+
+    :param widths:      (bool)
+
+when True, each guess also carries a width estimated from the peak's
+half-height width, with the height converted to the model's parameters so
+the guess is a complete starting peak.
+
+::
+
+    :param model:       (str)
+
+model the guesses are for, see engine.get_model(). Only used with widths.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of evenly sampled data, see trace.data_grid(). Positions and widths
+are then worked out from sample indices, and x may be None.
+
+::
+
+    :return:            (list)
+
+[height, position] lists - the format of the points clicked in the GUI - or
+[height, position, width] lists with widths, in order of position.
+    """
+    y = asarray(y, dtype=float64)
+
+    if smooth and y.shape[0] > smooth:
+        # savgol needs an odd window longer than its polynomial order
+        window = int(smooth) | 1
+        smoothed = savgol_filter(y, max(window, 5), 3)
+    else:
+        smoothed = y
+
+    span = smoothed.max() - smoothed.min() if smoothed.shape[0] else 0.0
+
+    found, properties = find_peaks(
+        smoothed, prominence=prominence * span, width=min_width
+    )
+
+    heights = smoothed[found]
+
+    if x_grid is not None:
+        positions = x_grid[0] + x_grid[1] * found
+    else:
+        x = asarray(x, dtype=float64)
+        positions = x[found]
+
+    if not widths:
+        return [[h, b] for h, b in zip(heights.tolist(), positions.tolist())]
+
+    # half-height widths, from fractional sample indices to x units
+    if x_grid is not None:
+        fwhm = x_grid[1] * (properties['right_ips'] - properties['left_ips'])
+    else:
+        samples = arange(x.shape[0])
+        fwhm = interp(properties['right_ips'], samples, x) \
+            - interp(properties['left_ips'], samples, x)
+
+    model = get_model(model)
+    if model.name == 'Asymmetric Gaussian':
+        # exp(-u^2 c^2 / 2) halves at u = sqrt(2 ln 2) / c, and the height
+        # of an unskewed peak is a / (c sqrt(2 pi))
+        c = 2.0 * sqrt(2.0 * log(2.0)) / fwhm
+        heights = heights * c * sqrt(2.0 * pi)
+    else:
+        # exp(-u^2 / c^2) halves at u = c sqrt(ln 2)
+        c = fwhm / (2.0 * sqrt(log(2.0)))
+
+    return [
+        [a, b, width] for a, b, width in
+        zip(heights.tolist(), positions.tolist(), c.tolist())
+    ]
@@ -0,0 +1,196 @@
+"""
+:code:`sequence.py`
+===================
+
+warm-started fitting for sequences of injections of the same method. Retention
+times and widths barely move from one run to the next, so rather than starting
+every fit from clicked positions with the model's default widths, each fit
+starts from the previous run's converged parameters - shifted by a cross-
+correlation alignment of the retention times - and converges in a handful of
+iterations.
+
+"""
+
+from numpy import (
+    asarray, float64, linspace, interp, argmax, arange, concatenate
+)
+
+from numpy.fft import rfft, irfft
+
+from pyGC.engine import fit
+
+
+def align_shift(previous, x, y, max_shift=None, x_grid=None):
+    """
+
+retention time shift of a chromatogram relative to a previous fit, from the
+cross-correlation of the data with the previous fitted curve.
+
+::
+
+    :param previous:    (FitResult)
+
+fit of the previous run.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the new run, x in ascending order.
+
+::
+
+    :param max_shift:   (float)
+
+largest shift looked for, in x units. None allows any shift.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of evenly sampled data, see trace.data_grid(). y is then correlated
+as it is, without resampling, and x may be None.
+
+::
+
+    :return:            (float)
+
+shift in x units - positive if the new run elutes later.
+    """
+    y = asarray(y, dtype=float64)
+    n = y.shape[0]
+
+    # both curves on one even grid, so the lag is a whole number of samples
+    if x_grid is not None:
+        step = x_grid[1]
+        grid = x_grid[0] + step * arange(n, dtype=float64)
+        signal = y - y.mean()
+    else:
+        x = asarray(x, dtype=float64)
+        grid = linspace(x[0], x[-1], n)
+        step = (x[-1] - x[0]) / (n - 1)
+        signal = interp(grid, x, y)
+        signal -= signal.mean()
+
+    template = previous.evaluate(grid)
+    template -= template.mean()
+
+    # zero padded to 2n so the correlation doesn't wrap around
+    corr = irfft(rfft(signal, 2 * n) * rfft(template, 2 * n).conj(), 2 * n)
+
+    lags = arange(-n + 1, n)
+    corr = concatenate((corr[n + 1:], corr[:n]))
+
+    if max_shift is not None:
+        keep = abs(lags) <= max_shift / step
+        lags, corr = lags[keep], corr[keep]
+
+    i = int(argmax(corr))
+    lag = float(lags[i])
+
+    # parabola through the peak of the correlation for a sub-sample shift
+    if 0 < i < corr.shape[0] - 1:
+        curve = corr[i - 1] - 2 * corr[i] + corr[i + 1]
+        if curve < 0:
+            lag += 0.5 * (corr[i - 1] - corr[i + 1]) / curve
+
+    return lag * step
+
+
+def warm_initials(previous, x, y, max_shift=None, x_grid=None):
+    """
+
+starting guesses for a new run from the fit of the previous one.
+
+::
+
+    :param previous:    (FitResult)
+
+fit of the previous run.
+
+::
+
+    :param x:           (array)
+    :param y:           (array)
+
+x and y data of the new run, x in ascending order.
+
+::
+
+    :param max_shift:   (float)
+
+largest retention time shift looked for, see align_shift().
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of evenly sampled data, see align_shift().
+
+::
+
+    :return:            (list)
+
+a list of [height, position, width(, skew)] lists - the previous parameters
+with every position moved by the alignment shift, ready for fit().
+    """
+    shift = align_shift(previous, x, y, max_shift, x_grid)
+
+    initials = previous.peaks.tolist()
+    for guess in initials:
+        guess[1] += shift
+
+    return initials
+
+
+def fit_sequence(runs, initials, model='Symmetric Gaussian', solver='leastsq',
+                 max_shift=None):
+    """
+
+fits a sequence of runs, each one warm-started from the fit before it.
+
+::
+
+    :param runs:        (iterable)
+
+(x, y) data of each run, in injection order.
+
+::
+
+    :param initials:    (list)
+
+a list of [height, position, ...] lists the first run is fitted from.
+
+::
+
+    :param model:       (str)
+
+model to fit, see engine.get_model().
+
+::
+
+    :param solver:      (str)
+
+least square solver, see engine.fit().
+
+::
+
+    :param max_shift:   (float)
+
+largest retention time shift between consecutive runs, see align_shift().
+
+::
+
+    :return:            (generator)
+
+yields one FitResult per run, in order.
+    """
+    previous = None
+
+    for x, y in runs:
+        if previous is not None:
+            initials = warm_initials(previous, x, y, max_shift)
+
+        previous = fit(x, y, initials, model, solver=solver)
+        yield previous
@@ -0,0 +1,201 @@
+"""
+:code:`trace.py`
+================
+
+implicit x axis representation for evenly sampled GC data. Nearly every
+detector samples at a constant interval, so there is no need to keep the x
+column around - a trace is stored as (x0, dx, y), and anything which would
+search the x column (fit windows, cluster splits, peak positions) works out
+indices from the grid with grid_span() instead. x is only rebuilt while
+something needs its values, such as a plot or a model evaluation.
+
+"""
+
+from collections import namedtuple
+
+from numpy import (
+    arange, abs as np_abs, asfortranarray, float64,
+    ceil, floor, clip, int64
+)
+
+
+# largest deviation of any x value from the implied grid, as a fraction of
+# the sampling interval, for data to still count as evenly spaced
+GRID_TOLERANCE = 1e-3
+
+
+class UniformTrace(namedtuple('UniformTrace', ['x0', 'dx', 'y'])):
+    """
+
+GC data sampled on the grid x0 + i * dx. y holds one column per detector
+channel, so column i of the equivalent Nx(k + 1) data array is y[:, i - 1].
+Supports the .shape of that array and the column() lookup, so it can be used
+wherever the GUI uses the data array.
+    """
+
+    __slots__ = ()
+
+    @property
+    def shape(self):
+        return self.y.shape[0], self.y.shape[1] + 1
+
+    @property
+    def x(self):
+        # materialized on demand - the trace itself never stores it
+        return self.x0 + self.dx * arange(self.y.shape[0], dtype=float64)
+
+    def column(self, i):
+        """
+
+column i of the equivalent data array - the x grid for 0, otherwise
+detector channel i.
+
+::
+
+        :param i:       (int)
+
+index of the column.
+
+::
+
+        :return:        (array)
+
+the requested column.
+        """
+        return self.x if i == 0 else self.y[:, i - 1]
+
+
+def uniform_trace(data, tolerance=GRID_TOLERANCE, dtype=None):
+    """
+
+checks whether GC data is evenly sampled and, if so, drops its x column.
+
+::
+
+    :param data:        (array)
+
+Nx(k + 1) data array from calc_primer().
+
+::
+
+    :param tolerance:   (float)
+
+largest deviation of any x value from the implied grid, as a fraction of the
+sampling interval.
+
+::
+
+    :param dtype:       (type)
+
+dtype the channels are stored in. None keeps the dtype of data.
+
+::
+
+    :return:            (UniformTrace)
+
+the data as a UniformTrace if it is evenly sampled, otherwise None.
+    """
+
+    if data.shape[0] < 2 or data.shape[1] < 2:
+        return None
+
+    x = data[:, 0]
+    x0 = float(x[0])
+    dx = (float(x[-1]) - x0) / (x.shape[0] - 1)
+
+    if dx == 0 or dx != dx:
+        return None
+
+    # one vectorized pass against the implied grid
+    deviation = np_abs(x - (x0 + dx * arange(x.shape[0], dtype=float64)))
+    if deviation.max() > tolerance * abs(dx):
+        return None
+
+    return UniformTrace(x0, dx, asfortranarray(data[:, 1:], dtype=dtype))
+
+
+def column(data, i):
+    """
+
+column i of GC data held either as a data array or as a UniformTrace.
+
+::
+
+    :param data:        (array); (UniformTrace)
+
+the GC data.
+
+::
+
+    :param i:           (int)
+
+index of the column - 0 for x.
+
+::
+
+    :return:            (array)
+
+the requested column.
+    """
+    if isinstance(data, UniformTrace):
+        return data.column(i)
+    return data[:, i]
+
+
+def data_grid(data):
+    """
+
+the (x0, dx) grid of GC data, for the grid arguments of the fitting code.
+
+::
+
+    :param data:        (array); (UniformTrace)
+
+the GC data.
+
+::
+
+    :return:            (tuple)
+
+(x0, dx) of a UniformTrace sampled in ascending order, otherwise None.
+    """
+    if isinstance(data, UniformTrace) and data.dx > 0:
+        return data.x0, data.dx
+    return None
+
+
+def grid_span(x_grid, lo, hi, n):
+    """
+
+index range of the samples with lo <= x <= hi on an ascending grid - what
+searchsorted() on the rebuilt x would give, by index arithmetic.
+
+::
+
+    :param x_grid:      (tuple)
+
+(x0, dx) of the grid, dx > 0.
+
+::
+
+    :param lo:          (float); (array)
+    :param hi:          (float); (array)
+
+bounds in x - arrays give one range per pair of bounds.
+
+::
+
+    :param n:           (int)
+
+number of samples on the grid.
+
+::
+
+    :return:            (tuple)
+
+(start, stop) int64 indices, clipped to the grid - x[start:stop] is the span.
+    """
+    x0, dx = x_grid
+    start = clip(ceil((lo - x0) / dx), 0, n).astype(int64)
+    stop = clip(floor((hi - x0) / dx) + 1, 0, n).astype(int64)
+    return start, stop
@@ -29,19 +29,23 @@ setup(
 
     include_package_data=False,
 
-    python_requires='>=3.6',
+    python_requires='>=3.8',
 
     install_requires=[
         'kivy',
         'numpy',
-        'pandas',
+        'pandas>=1.3',
         'xlrd',
+        'openpyxl',
         'matplotlib',
         'scipy',
     ],
 
     entry_points={
-        'console_scripts': ['pyGC-init=pyGC.__main__:main']
+        'console_scripts': [
+            'pyGC-init=pyGC.__main__:main',
+            'pyGC-convert=pyGC.ingest:convert_files'
+        ]
     },
 
     project_urls={